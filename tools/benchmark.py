@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark the database panels against the fake trove service.
+
+Needs a horizon checkout with ``trove_dashboard`` in ``INSTALLED_APPS``
+(see README.rst). Every view runs in its own forked process against a
+seeded ``tools/fake_trove.py`` server and is reported with its p50/p99
+latency, trove API calls per request, HTTP connections opened versus
+requests sent, and peak memory growth::
+
+    python tools/benchmark.py --instances 2000 --backups 50000 \\
+        --latency 0.02 --iterations 20
+
+``--rows`` renders pages of that many rows, to watch the memory the
+index tables take per row::
+
+    python tools/benchmark.py --rows 10000 --view 'instances index' \\
+        --view 'backups index' --iterations 3
+"""
+from __future__ import print_function
+
+import datetime
+import optparse
+import os
+import resource
+import sys
+import time
+
+import simplejson as json
+
+import fake_trove
+
+
+class FakeToken(object):
+
+    def __init__(self):
+        self.id = 'fake-token'
+        self.expires = datetime.datetime.utcnow() + datetime.timedelta(1)
+
+
+class FakeUser(object):
+    """Just enough of an ``openstack_auth`` user for the panels."""
+
+    def __init__(self, service_catalog):
+        self.id = 'fake-user'
+        self.username = 'fake'
+        self.token = FakeToken()
+        self.tenant_id = fake_trove.TENANT
+        self.tenant_name = fake_trove.TENANT
+        self.service_catalog = service_catalog
+        self.services_region = 'RegionOne'
+        self.available_services_regions = []
+        self.authorized_tenants = []
+        self.roles = [{'name': 'admin'}]
+        self.is_superuser = False
+
+    def is_authenticated(self):
+        return True
+
+    def is_anonymous(self):
+        return False
+
+    def has_perm(self, perm, obj=None):
+        return True
+
+    def has_perms(self, perms, obj=None):
+        return True
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1)
+    return values[max(index, 0)]
+
+
+def scenarios(data):
+    """(name, view import path, url kwargs, GET params, ajax) tuples."""
+    instance_id = data.instances[0]['id']
+    detail = {'instance_id': instance_id}
+    return [
+        ('instances index', 'databases.views.IndexView', {}, {}, False),
+        ('instance detail', 'databases.views.DetailView', detail, {},
+         False),
+        ('users tab', 'databases.views.DetailView', detail,
+         {'tab': 'instance_details__users_tab'}, True),
+        ('databases tab', 'databases.views.DetailView', detail,
+         {'tab': 'instance_details__database_tab'}, True),
+        ('backups tab', 'databases.views.DetailView', detail,
+         {'tab': 'instance_details__backups_tab'}, True),
+        ('backups index', 'database_backups.views.IndexView', {}, {},
+         False),
+        ('launch workflow', 'databases.views.LaunchInstanceView', {}, {},
+         False),
+        ('backup workflow', 'database_backups.views.BackupView', {}, {},
+         False),
+    ]
+
+
+def _import(path):
+    module, name = ('trove_dashboard.' + path).rsplit('.', 1)
+    return getattr(__import__(module, fromlist=[name]), name)
+
+
+def _request(factory, server, params, ajax):
+    from django.contrib.messages.storage.cookie import CookieStorage
+    from trove_dashboard.api import metrics
+
+    extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if ajax else {}
+    request = factory.get('/', params, **extra)
+    request.user = FakeUser(server.service_catalog())
+    request.session = {}
+    request.horizon = {'dashboard': None, 'panel': None,
+                       'async_messages': []}
+    request._messages = CookieStorage(request)
+    metrics.start_request_timings(request)
+    return request
+
+
+def run_scenario(server, scenario, iterations):
+    from django.test.client import RequestFactory
+    from trove_dashboard.api import metrics
+    from trove_dashboard.api import trove
+
+    name, path, kwargs, params, ajax = scenario
+    view = _import(path).as_view()
+    factory = RequestFactory()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    calls = []
+    errors = 0
+    for i in range(iterations):
+        request = _request(factory, server, params, ajax)
+        start = time.time()
+        try:
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        except Exception:
+            errors += 1
+        latencies.append(time.time() - start)
+        calls.append(metrics.get_request_timings(request).count())
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'view': name,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'first_ms': latencies[0] * 1000,
+            'calls': float(sum(calls)) / len(calls),
+            'errors': errors,
+            'pool': trove.client_pool.stats(),
+            'peak_rss_kb': rss_after - rss_before}
+
+
+def run_forked(server, scenario, iterations):
+    """Run a scenario in a child so its peak memory is measured alone.
+
+    The fake server keeps running in this process, so the HTTP counters
+    are read here once the child is done.
+    """
+    server.reset_counters()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = run_scenario(server, scenario, iterations)
+        except Exception as e:
+            result = {'view': scenario[0], 'failed': repr(e)}
+        os.write(write_fd, json.dumps(result))
+        os.close(write_fd)
+        os._exit(0)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    result = json.loads(''.join(chunks))
+    result['http_requests'] = server.requests
+    result['http_connections'] = server.connections
+    return result
+
+
+def report(results):
+    header = ('%-18s %9s %9s %9s %7s %6s %13s %10s'
+              % ('view', 'p50 ms', 'p99 ms', 'first ms', 'calls', 'errors',
+                 'http req/conn', 'peak KB'))
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        if 'failed' in result:
+            print('%-18s failed: %s' % (result['view'], result['failed']))
+            continue
+        print('%-18s %9.1f %9.1f %9.1f %7.1f %6d %6d/%-6d %10d'
+              % (result['view'], result['p50_ms'], result['p99_ms'],
+                 result['first_ms'], result['calls'], result['errors'],
+                 result['http_requests'], result['http_connections'],
+                 result['peak_rss_kb']))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--instances', type='int', default=100)
+    parser.add_option('--flavors', type='int', default=6)
+    parser.add_option('--users', type='int', default=5)
+    parser.add_option('--databases', type='int', default=5)
+    parser.add_option('--backups', type='int', default=200)
+    parser.add_option('--latency', type='float', default=0,
+                      help='Seconds added to every fake API response.')
+    parser.add_option('--error-rate', type='float', default=0,
+                      help='Fraction of fake API requests that fail.')
+    parser.add_option('--seed', type='int', default=0,
+                      help='Seed of the fake data, keep it to compare '
+                           'runs.')
+    parser.add_option('--iterations', type='int', default=10)
+    parser.add_option('--page-size', type='int', default=None)
+    parser.add_option('--rows', type='int', default=None,
+                      help='Seed this many instances and backups and '
+                           'show them on a single page.')
+    parser.add_option('--view', action='append', default=[],
+                      help='Only run the named view, may be repeated.')
+    parser.add_option('--json', action='store_true', default=False,
+                      help='Print the results as JSON.')
+    options, args = parser.parse_args()
+    if options.rows:
+        options.instances = options.backups = options.rows
+        options.page_size = options.rows
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                          'openstack_dashboard.settings')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    from django.conf import settings
+    if options.page_size:
+        settings.TROVE_INSTANCE_PAGE_SIZE = options.page_size
+        settings.TROVE_BACKUP_PAGE_SIZE = options.page_size
+
+    data = fake_trove.FakeData(instances=options.instances,
+                               flavors=options.flavors,
+                               users=options.users,
+                               databases=options.databases,
+                               backups=options.backups,
+                               seed=options.seed)
+    server = fake_trove.FakeTrove(data, latency=options.latency,
+                                  error_rate=options.error_rate,
+                                  seed=options.seed)
+    server.start()
+
+    results = [run_forked(server, scenario, options.iterations)
+               for scenario in scenarios(data)
+               if not options.view or scenario[0] in options.view]
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
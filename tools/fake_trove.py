@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Fake Trove and Nova endpoints for local benchmarking.
+
+Serves the subset of the Trove v1.0 and Nova v2 APIs the dashboard uses,
+backed by seeded in-memory data, on a local port. troveclient talks to it
+through ``rdclient`` when the user's service catalog points at it, see
+``FakeTrove.service_catalog``.
+
+Run standalone with::
+
+    python tools/fake_trove.py --instances 500 --backups 50000 --latency 0.02
+"""
+from __future__ import print_function
+
+import BaseHTTPServer
+import optparse
+import random
+import re
+import SocketServer
+import threading
+import time
+import urlparse
+
+import simplejson as json
+
+
+TENANT = 'fake-tenant'
+CREATED = '2013-06-01T12:00:00'
+UPDATED = '2013-06-01T12:05:00'
+
+
+class Items(list):
+    """Resources in listing order, indexed by id.
+
+    Looking an item or a marker up does not scan the list, so paging
+    through every resource stays linear.
+    """
+
+    def __init__(self, items=()):
+        super(Items, self).__init__(items)
+        self._by_id = dict((item['id'], item) for item in self)
+        self._positions = None
+
+    def append(self, item):
+        super(Items, self).append(item)
+        self._by_id[item['id']] = item
+        if self._positions is not None:
+            self._positions[item['id']] = len(self) - 1
+
+    def remove(self, item):
+        super(Items, self).remove(item)
+        del self._by_id[item['id']]
+        # Rebuilt on the next lookup, deletes often come in batches.
+        self._positions = None
+
+    def get(self, item_id):
+        return self._by_id.get(item_id)
+
+    def position(self, item_id):
+        positions = self._positions
+        if positions is None:
+            positions = dict((item['id'], index)
+                             for index, item in enumerate(self))
+            self._positions = positions
+        return positions.get(item_id)
+
+
+def _paginate(items, query, key):
+    """Slice ``items`` like Trove does with ``limit`` and ``marker``."""
+    limit = int(query.get('limit', [0])[0] or 0)
+    marker = query.get('marker', [None])[0]
+    start = 0
+    if marker is not None:
+        position = items.position(marker)
+        if position is not None:
+            start = position + 1
+    if not limit:
+        return {key: items[start:]}
+    page = items[start:start + limit]
+    body = {key: page}
+    if start + limit < len(items):
+        body['links'] = [{'rel': 'next',
+                          'href': 'http://localhost/%s?limit=%d&marker=%s'
+                                  % (key, limit, page[-1]['id'])}]
+    return body
+
+
+class FakeData(object):
+    """Seeded, deterministic Trove and Nova resources of one project.
+
+    The same ``seed`` always gives the same resources.
+    """
+
+    def __init__(self, instances=100, flavors=6, users=5, databases=5,
+                 backups=200, building=0.1, deleted_backups=0.05, seed=0):
+        self.lock = threading.Lock()
+        rand = random.Random(seed)
+        self.flavors = Items({'id': str(i + 1),
+                              'name': 'm1.flavor%d' % (i + 1),
+                              'ram': 512 * 2 ** i,
+                              'vcpus': 2 ** i,
+                              'disk': 10 * (i + 1),
+                              'OS-FLV-EXT-DATA:ephemeral': 0,
+                              'links': []}
+                             for i in range(flavors))
+        self.instances = Items()
+        for i in range(instances):
+            status = 'BUILD' if rand.random() < building else 'ACTIVE'
+            self.instances.append({
+                'id': 'instance-%06d' % i,
+                'name': 'database-%06d' % i,
+                'status': status,
+                'flavor': {'id': self.flavors[i % flavors]['id'],
+                           'links': []},
+                'volume': {'size': 1 + i % 10},
+                'ip': ['10.0.%d.%d' % (i // 250, i % 250 + 1)],
+                'created': CREATED,
+                'updated': UPDATED,
+                'links': []})
+        self.users = dict((instance['id'],
+                           [{'name': 'user%d' % u, 'host': '%',
+                             'databases': [{'name': 'db%d' % u}]}
+                            for u in range(users)])
+                          for instance in self.instances)
+        self.databases = dict((instance['id'],
+                               [{'name': 'db%d' % d}
+                                for d in range(databases)])
+                              for instance in self.instances)
+        self.backups = Items()
+        for i in range(backups):
+            if self.instances and rand.random() >= deleted_backups:
+                instance_id = self.instances[i % instances]['id']
+            else:
+                instance_id = 'deleted-instance-%06d' % i
+            self.backups.append({
+                'id': 'backup-%06d' % i,
+                'name': 'backup-%06d' % i,
+                'description': None,
+                'instance_id': instance_id,
+                'locationRef': 'http://swift/backups/backup-%06d' % i,
+                'status': 'COMPLETED',
+                'size': 0.1,
+                'created': CREATED,
+                'updated': UPDATED})
+
+    def find(self, items, item_id):
+        return items.get(item_id)
+
+
+class FakeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = (
+        ('GET', r'/v1\.0/[^/]+/instances$', 'list_instances'),
+        ('POST', r'/v1\.0/[^/]+/instances$', 'create_instance'),
+        ('GET', r'/v1\.0/[^/]+/instances/([^/]+)$', 'get_instance'),
+        ('DELETE', r'/v1\.0/[^/]+/instances/([^/]+)$', 'delete'),
+        ('POST', r'/v1\.0/[^/]+/instances/([^/]+)/action$', 'accepted'),
+        ('GET', r'/v1\.0/[^/]+/instances/([^/]+)/backups$',
+         'instance_backups'),
+        ('GET', r'/v1\.0/[^/]+/instances/([^/]+)/databases$',
+         'list_databases'),
+        ('DELETE', r'/v1\.0/[^/]+/instances/([^/]+)/databases/([^/]+)$',
+         'delete'),
+        ('GET', r'/v1\.0/[^/]+/instances/([^/]+)/users$', 'list_users'),
+        ('GET', r'/v1\.0/[^/]+/instances/([^/]+)/users/([^/]+)/databases$',
+         'user_access'),
+        ('DELETE', r'/v1\.0/[^/]+/instances/([^/]+)/users/([^/]+)$',
+         'delete'),
+        ('GET', r'/v1\.0/[^/]+/backups$', 'list_backups'),
+        ('POST', r'/v1\.0/[^/]+/backups$', 'create_backup'),
+        ('GET', r'/v1\.0/[^/]+/backups/([^/]+)$', 'get_backup'),
+        ('DELETE', r'/v1\.0/[^/]+/backups/([^/]+)$', 'delete'),
+        ('GET', r'/v1\.0/[^/]+/flavors$', 'list_flavors'),
+        ('GET', r'/v1\.0/[^/]+/flavors/([^/]+)$', 'get_flavor'),
+        ('GET', r'/v2/[^/]+/flavors(/detail)?$', 'list_flavors'),
+        ('GET', r'/v2/[^/]+/limits$', 'limits'),
+    )
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format,
+                                                              *args)
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body) if body is not None else ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, method):
+        server = self.server
+        server.count_request()
+        parsed = urlparse.urlparse(self.path)
+        self.query = urlparse.parse_qs(parsed.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = json.loads(self.rfile.read(length)) if length else None
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.random() < server.error_rate:
+            return self._send(500, {'computeFault': {
+                'code': 500, 'message': 'Injected failure'}})
+        for route_method, pattern, name in self.routes:
+            match = re.match(pattern, parsed.path)
+            if route_method == method and match:
+                return getattr(self, name)(*match.groups())
+        self._send(404, {'itemNotFound': {'code': 404,
+                                          'message': 'No such route'}})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _not_found(self):
+        self._send(404, {'itemNotFound': {'code': 404,
+                                          'message': 'Not Found'}})
+
+    def accepted(self, *args):
+        self._send(202)
+
+    def delete(self, *args):
+        data = self.server.data
+        with data.lock:
+            if len(args) == 1:
+                for items in (data.instances, data.backups):
+                    item = data.find(items, args[0])
+                    if item is not None:
+                        items.remove(item)
+        self._send(202)
+
+    def list_instances(self):
+        self._send(200, _paginate(self.server.data.instances, self.query,
+                                  'instances'))
+
+    def get_instance(self, instance_id):
+        instance = self.server.data.find(self.server.data.instances,
+                                         instance_id)
+        if instance is None:
+            return self._not_found()
+        self._send(200, {'instance': instance})
+
+    def create_instance(self):
+        data = self.server.data
+        request = self.body['instance']
+        with data.lock:
+            instance = {'id': 'instance-new-%06d' % len(data.instances),
+                        'name': request['name'],
+                        'status': 'BUILD',
+                        'flavor': {'id': str(request['flavorRef']).split(
+                            '/')[-1], 'links': []},
+                        'volume': request.get('volume'),
+                        'created': CREATED,
+                        'updated': UPDATED,
+                        'links': []}
+            data.instances.append(instance)
+            data.users[instance['id']] = []
+            data.databases[instance['id']] = []
+        self._send(200, {'instance': instance})
+
+    def instance_backups(self, instance_id):
+        self._send(200, {'backups': [b for b in self.server.data.backups
+                                     if b['instance_id'] == instance_id]})
+
+    def list_databases(self, instance_id):
+        self._send(200, {'databases':
+                         self.server.data.databases.get(instance_id, [])})
+
+    def list_users(self, instance_id):
+        self._send(200, {'users':
+                         self.server.data.users.get(instance_id, [])})
+
+    def user_access(self, instance_id, user_name):
+        for user in self.server.data.users.get(instance_id, []):
+            if user['name'] == user_name:
+                return self._send(200, {'databases': user['databases']})
+        self._not_found()
+
+    def list_backups(self):
+        self._send(200, _paginate(self.server.data.backups, self.query,
+                                  'backups'))
+
+    def get_backup(self, backup_id):
+        backup = self.server.data.find(self.server.data.backups, backup_id)
+        if backup is None:
+            return self._not_found()
+        self._send(200, {'backup': backup})
+
+    def create_backup(self):
+        data = self.server.data
+        request = self.body['backup']
+        with data.lock:
+            backup = {'id': 'backup-new-%06d' % len(data.backups),
+                      'name': request['name'],
+                      'description': request.get('description'),
+                      'instance_id': request['instance'],
+                      'locationRef': None,
+                      'status': 'NEW',
+                      'created': CREATED,
+                      'updated': UPDATED}
+            data.backups.append(backup)
+        self._send(202, {'backup': backup})
+
+    def list_flavors(self, detail=None):
+        self._send(200, {'flavors': self.server.data.flavors})
+
+    def get_flavor(self, flavor_id):
+        flavor = self.server.data.find(self.server.data.flavors, flavor_id)
+        if flavor is None:
+            return self._not_found()
+        self._send(200, {'flavor': flavor})
+
+    def limits(self):
+        data = self.server.data
+        self._send(200, {'limits': {'rate': [], 'absolute': {
+            'maxTotalInstances': 10000,
+            'totalInstancesUsed': len(data.instances),
+            'maxTotalCores': 100000,
+            'totalCoresUsed': len(data.instances),
+            'maxTotalRAMSize': 10000000,
+            'totalRAMUsed': 512 * len(data.instances)}}})
+
+
+class FakeTrove(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Threaded local server; ``connections`` counts accepted sockets."""
+
+    daemon_threads = True
+
+    def __init__(self, data, host='127.0.0.1', port=0, latency=0,
+                 error_rate=0, verbose=False, seed=0):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), FakeHandler)
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.verbose = verbose
+        self.connections = 0
+        self.requests = 0
+        self._counter_lock = threading.Lock()
+
+    def get_request(self):
+        request = BaseHTTPServer.HTTPServer.get_request(self)
+        with self._counter_lock:
+            self.connections += 1
+        return request
+
+    def count_request(self):
+        with self._counter_lock:
+            self.requests += 1
+
+    def random(self):
+        """Next number of the seeded sequence of injected failures."""
+        with self._random_lock:
+            return self._random.random()
+
+    def reset_counters(self):
+        with self._counter_lock:
+            self.connections = 0
+            self.requests = 0
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self.server_address
+
+    def service_catalog(self, region='RegionOne'):
+        """Catalog for a fake user whose endpoints point at this server."""
+        def service(service_type, name, path):
+            url = '%s/%s/%s' % (self.url, path, TENANT)
+            return {'type': service_type, 'name': name,
+                    'endpoints': [{'region': region, 'publicURL': url,
+                                   'internalURL': url, 'adminURL': url}]}
+        return [service('database', 'trove', 'v1.0'),
+                service('compute', 'nova', 'v2')]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--host', default='127.0.0.1')
+    parser.add_option('--port', type='int', default=8779)
+    parser.add_option('--instances', type='int', default=100)
+    parser.add_option('--flavors', type='int', default=6)
+    parser.add_option('--users', type='int', default=5)
+    parser.add_option('--databases', type='int', default=5)
+    parser.add_option('--backups', type='int', default=200)
+    parser.add_option('--latency', type='float', default=0,
+                      help='Seconds added to every response.')
+    parser.add_option('--error-rate', type='float', default=0,
+                      help='Fraction of requests answered with a 500.')
+    parser.add_option('--seed', type='int', default=0,
+                      help='Seed of the generated data and failures.')
+    parser.add_option('--verbose', action='store_true', default=False)
+    options, args = parser.parse_args()
+    data = FakeData(instances=options.instances, flavors=options.flavors,
+                    users=options.users, databases=options.databases,
+                    backups=options.backups, seed=options.seed)
+    server = FakeTrove(data, host=options.host, port=options.port,
+                       latency=options.latency,
+                       error_rate=options.error_rate,
+                       verbose=options.verbose, seed=options.seed)
+    print('Fake trove listening on %s' % server.url)
+    print(json.dumps(server.service_catalog(), indent=2))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
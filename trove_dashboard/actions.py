@@ -0,0 +1,176 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Table actions shared by the database panels.
+"""
+import logging
+import time
+
+from django import shortcuts
+from django.conf import settings
+from django.core import urlresolvers
+from django.utils.encoding import force_unicode
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import messages
+from horizon import tables
+
+from trove_dashboard import api
+
+
+LOG = logging.getLogger(__name__)
+
+CONCURRENCY = getattr(settings, 'TROVE_BATCH_ACTION_CONCURRENCY', 5)
+TIMEOUT = getattr(settings, 'TROVE_BATCH_ACTION_TIMEOUT', 50)
+ITEM_TIMEOUT = getattr(settings, 'TROVE_BATCH_ACTION_ITEM_TIMEOUT', 10)
+CALL_TIMEOUT = getattr(settings, 'TROVE_WRITE_CALL_TIMEOUT', 20)
+
+# Threads of the bulk writes. They may sleep in the rate limiter or wait
+# on slow writes, so they must not be the threads the pages read with.
+write_executor = api.fanout.Executor(
+    getattr(settings, 'TROVE_WRITE_WORKERS', 10))
+
+# Writes toward Trove per project, shared by every bulk action.
+write_limiter = api.ratelimit.RateLimiter(
+    rate=getattr(settings, 'TROVE_WRITE_RATE', 10),
+    burst=getattr(settings, 'TROVE_WRITE_BURST', 20))
+
+
+class RateLimited(Exception):
+    """No write slot was free before the deadline of the item."""
+
+
+def rate_limit_key(request):
+    return (getattr(request.user, 'services_region', None),
+            request.user.tenant_id)
+
+
+def limited(request, func, *args, **kwargs):
+    """Call ``func`` once ``write_limiter`` allows it.
+
+    Raises ``RateLimited`` if that takes longer than ``ITEM_TIMEOUT``. The
+    call itself fails once the endpoint is silent for ``CALL_TIMEOUT``
+    seconds.
+    """
+    if not write_limiter.acquire(rate_limit_key(request),
+                                 time.time() + ITEM_TIMEOUT):
+        raise RateLimited("No write slot within %ss" % ITEM_TIMEOUT)
+    with api.pool.call_timeout(CALL_TIMEOUT):
+        return func(request, *args, **kwargs)
+
+
+def join_names(names):
+    return ', '.join(force_unicode(name) for name in names)
+
+
+class ConcurrentBatchAction(tables.BatchAction):
+    """A ``BatchAction`` running ``action`` for the selected rows at once.
+
+    Horizon calls ``action`` for one row after the other, which holds the
+    web worker for minutes when hundreds of rows are selected. Here up to
+    ``concurrency`` calls run at the same time on ``write_executor``,
+    each waits for a slot of the per project ``write_limiter`` and the
+    whole batch gives up after ``timeout`` seconds. The outcome is
+    reported in one message per kind: done, failed and given up.
+    """
+    concurrency = CONCURRENCY
+    timeout = TIMEOUT
+
+    def _action(self, request, obj_id):
+        return limited(request, self.action, obj_id)
+
+    def handle(self, table, request, obj_ids):
+        selected = []
+        not_allowed = []
+        for datum_id in obj_ids:
+            datum = table.get_object_by_id(datum_id)
+            datum_display = table.get_object_display(datum) or _("N/A")
+            if not table._filter_action(self, request, datum):
+                not_allowed.append(datum_display)
+                continue
+            selected.append((datum_id, datum, datum_display))
+
+        start = time.time()
+        results = api.fanout.fanout(
+            request, [(self._action, (datum_id,))
+                      for datum_id, datum, datum_display in selected],
+            timeout=self.timeout, concurrency=self.concurrency,
+            executor=write_executor)
+
+        succeeded = []
+        failed = []
+        unfinished = []
+        for (datum_id, datum, datum_display), result in zip(selected,
+                                                            results):
+            if result.ok:
+                self.update(request, datum)
+                self.success_ids.append(datum_id)
+                succeeded.append(datum_display)
+            elif isinstance(result.exception, api.fanout.FanoutTimeout):
+                unfinished.append(datum_display)
+            else:
+                LOG.warning('Unable to %s "%s": %s',
+                            force_unicode(self._conjugate()).lower(),
+                            force_unicode(datum_display), result.exception)
+                failed.append(datum_display)
+        LOG.info("%s: %d done, %d failed, %d unfinished, %d not allowed "
+                 "in %.2fs", self.name, len(succeeded), len(failed),
+                 len(unfinished), len(not_allowed), time.time() - start)
+
+        # Begin with success message class, downgrade to info if problems.
+        success_message_level = messages.success
+        if not_allowed:
+            msg = _('You do not have permission to %(action)s: %(objs)s')
+            params = {"action": self._conjugate(not_allowed).lower(),
+                      "objs": join_names(not_allowed)}
+            messages.error(request, msg % params)
+            success_message_level = messages.info
+        if failed:
+            msg = _('Unable to %(action)s: %(objs)s')
+            params = {"action": self._conjugate(failed).lower(),
+                      "objs": join_names(failed)}
+            messages.error(request, msg % params)
+            success_message_level = messages.info
+        if unfinished:
+            msg = _('Gave up trying to %(action)s after %(timeout)s '
+                    'seconds, some may still complete: %(objs)s')
+            params = {"action": self._conjugate(unfinished).lower(),
+                      "timeout": self.timeout,
+                      "objs": join_names(unfinished)}
+            messages.warning(request, msg % params)
+            success_message_level = messages.info
+        if succeeded:
+            msg = _('%(action)s: %(objs)s')
+            params = {"action": self._conjugate(succeeded, True),
+                      "objs": join_names(succeeded)}
+            success_message_level(request, msg % params)
+
+        return shortcuts.redirect(self.get_success_url(request))
+
+
+class ExportLink(tables.LinkAction):
+    """Download every row of the table from a ``views.ExportView``."""
+    name = "export"
+    verbose_name = _("Export CSV")
+    classes = ("btn-download",)
+    format = "csv"
+
+    def allowed(self, request, datum=None):
+        return True
+
+    def get_link_url(self, datum=None):
+        return urlresolvers.reverse(self.url, kwargs={'format': self.format})
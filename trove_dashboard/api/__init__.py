@@ -1,5 +1,17 @@
 from openstack_dashboard.api import nova
+import budget
+import fanout
+import metrics
+import pool
+import ratelimit
+import search
 import trove
 
 assert nova
+assert budget
+assert fanout
+assert metrics
+assert pool
+assert ratelimit
+assert search
 assert trove
@@ -0,0 +1,110 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Per view budgets of Trove API calls.
+
+A view declares how many calls it may make while serving one request::
+
+    class IndexView(ApiBudgetMixin, tables.DataTableView):
+        api_budget = CallBudget(total=3, backup_list=1)
+
+Exceeding the budget, typically a loop that went back to one call per
+row, logs a warning, with the call sites of the offending operation when
+``DEBUG`` is set. With ``TROVE_API_BUDGET_STRICT`` (meant for test
+settings) it raises ``BudgetExceeded`` instead.
+"""
+import logging
+
+from django.conf import settings
+
+from trove_dashboard.api import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+
+class BudgetExceeded(AssertionError):
+    """A view made more Trove API calls than its budget allows."""
+
+
+class CallBudget(object):
+    """Maximum number of calls in total and per operation."""
+
+    def __init__(self, total=None, **per_operation):
+        self.total = total
+        self.per_operation = per_operation
+
+    def violations(self, timings):
+        found = []
+        if self.total is not None and timings.count() > self.total:
+            found.append((None, timings.count(), self.total))
+        for operation, limit in sorted(self.per_operation.items()):
+            count = timings.count(operation)
+            if count > limit:
+                found.append((operation, count, limit))
+        return found
+
+    def check(self, request, timings):
+        violations = self.violations(timings)
+        if not violations:
+            return
+        messages = []
+        for operation, count, limit in violations:
+            message = "%s: %d calls, budget %d" % (
+                operation or 'total', count, limit)
+            if timings.capture_sites:
+                sites = sorted(set(call[3] for call in timings.calls
+                                   if operation is None
+                                   or call[0] == operation))
+                message += ", from %s" % '; '.join(
+                    site or 'unknown' for site in sites)
+            messages.append(message)
+        message = "Trove API budget exceeded by %s: %s" % (
+            metrics.view_name(request), ' | '.join(messages))
+        if strict():
+            raise BudgetExceeded(message)
+        LOG.warning(message)
+
+
+def strict():
+    return getattr(settings, 'TROVE_API_BUDGET_STRICT', False)
+
+
+class ApiBudgetMixin(object):
+    """Check the ``api_budget`` of a view once its response is rendered."""
+
+    api_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.api_budget is None:
+            return super(ApiBudgetMixin, self).dispatch(request, *args,
+                                                        **kwargs)
+        timings = metrics.get_request_timings(request)
+        if timings is None:
+            timings = metrics.start_request_timings(request)
+        # Walking the stack on every call is not free, only name the
+        # call sites where someone reads them closely.
+        timings.capture_sites = strict() or settings.DEBUG
+        response = super(ApiBudgetMixin, self).dispatch(request, *args,
+                                                        **kwargs)
+        # Tables and tabs load their data while the template renders.
+        if getattr(response, 'is_rendered', True):
+            self.api_budget.check(request, timings)
+        else:
+            response.add_post_render_callback(
+                lambda response: self.api_budget.check(request, timings))
+        return response
@@ -0,0 +1,337 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Small in-process caches shared by the Trove API wrappers.
+"""
+import collections
+import cPickle
+import hashlib
+import logging
+import threading
+import time
+import uuid
+import zlib
+
+
+LOG = logging.getLogger(__name__)
+
+
+class TTLCache(object):
+    """Thread safe LRU cache where every entry may carry an expiry time.
+
+    ``maxsize`` bounds the number of entries, the least recently used one
+    is dropped first. ``ttl`` is the default lifetime in seconds, ``None``
+    means entries only leave the cache through the LRU bound.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.time():
+                    # Re-insert to mark the entry as most recently used.
+                    self._data[key] = entry
+                    if count:
+                        self.hits += 1
+                    return value
+                self.evictions += 1
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None, expires=None):
+        """Store ``value``, ``expires`` is an absolute epoch timestamp."""
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None:
+            ttl_expires = time.time() + ttl
+            if expires is None or ttl_expires < expires:
+                expires = ttl_expires
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def purge(self):
+        """Drop every expired entry."""
+        now = time.time()
+        with self._lock:
+            for key, (value, expires) in list(self._data.items()):
+                if expires is not None and expires <= now:
+                    del self._data[key]
+                    self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
+
+
+def _get_backend(alias):
+    try:
+        from django.core.cache import caches
+        return caches[alias]
+    except ImportError:
+        from django.core.cache import get_cache
+        return get_cache(alias)
+
+
+class _Chunks(object):
+    """Stored in the shared backend in place of a value split in chunks."""
+
+    def __init__(self, token, count):
+        self.token = token
+        self.count = count
+
+
+class SharedCache(object):
+    """Process local ``TTLCache`` in front of an optional Django cache.
+
+    When ``backend`` names a Django cache alias every worker process reads
+    and writes through it, so an entry fetched by one worker is reused by
+    the others. Values stored in the shared backend must be picklable.
+
+    With ``chunk_size`` set, values whose compressed pickle is larger are
+    split over several keys of the shared backend, memcached refuses
+    items over 1MB.
+    """
+
+    def __init__(self, prefix, maxsize=128, ttl=None, backend=None,
+                 chunk_size=None):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._shared = None
+        # Token of the chunked value each local entry was read from.
+        self._tokens = {}
+
+    @property
+    def shared(self):
+        if self.backend and self._shared is None:
+            self._shared = _get_backend(self.backend)
+        return self._shared
+
+    def _shared_key(self, key):
+        raw = ':'.join(str(k) for k in key)
+        return '%s:%s' % (self.prefix, hashlib.md5(raw).hexdigest())
+
+    def get(self, key, default=None, fresh=False):
+        """Return the cached value or ``default``.
+
+        ``fresh`` prefers the shared backend over the local copy, for
+        values another process keeps updating.
+        """
+        value = None
+        if not fresh or self.shared is None:
+            value = self._local.get(key)
+        if value is None and self.shared is not None:
+            value = self._shared_get(key)
+            if value is not None:
+                self._local.set(key, value)
+        if value is None:
+            return default
+        return value
+
+    def _shared_get(self, key):
+        shared_key = self._shared_key(key)
+        value = self.shared.get(shared_key)
+        if not isinstance(value, _Chunks):
+            self._tokens.pop(key, None)
+            return value
+        if self._tokens.get(key) == value.token:
+            # Same chunks as the local copy, skip fetching them again.
+            local = self._local.get(key)
+            if local is not None:
+                return local
+        keys = ['%s:%s:%d' % (shared_key, value.token, i)
+                for i in range(value.count)]
+        chunks = self.shared.get_many(keys)
+        if len(chunks) != len(keys):
+            # A chunk was evicted, the value is gone.
+            return None
+        self._tokens[key] = value.token
+        return cPickle.loads(zlib.decompress(
+            ''.join(chunks[k] for k in keys)))
+
+    def _shared_set(self, key, value, ttl):
+        shared_key = self._shared_key(key)
+        self._tokens.pop(key, None)
+        if self.chunk_size:
+            data = zlib.compress(
+                cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+            if len(data) > self.chunk_size:
+                token = uuid.uuid4().hex
+                size = self.chunk_size
+                chunks = {}
+                for i, start in enumerate(range(0, len(data), size)):
+                    chunk_key = '%s:%s:%d' % (shared_key, token, i)
+                    chunks[chunk_key] = data[start:start + size]
+                # The chunks go first, readers find them through the
+                # header stored last.
+                self.shared.set_many(chunks, ttl)
+                self._tokens[key] = token
+                value = _Chunks(token, len(chunks))
+        self.shared.set(shared_key, value, ttl)
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        self._local.set(key, value, ttl=ttl)
+        if self.shared is not None:
+            self._shared_set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        self._local.delete(key)
+        self._tokens.pop(key, None)
+        if self.shared is not None:
+            # Chunks left behind expire with their ttl.
+            self.shared.delete(self._shared_key(key))
+
+    def clear(self):
+        """Drop the local entries, the shared backend is left untouched."""
+        self._local.clear()
+        self._tokens.clear()
+
+    def stats(self):
+        return self._local.stats()
+
+
+class StaleCache(object):
+    """Serve cached values right away and refresh them in the background.
+
+    Entries older than ``soft_ttl``, or marked by ``expire``, are still
+    returned while a background thread reloads them. Entries older than
+    ``hard_ttl`` are gone and the caller waits for the loader. Values go
+    through a ``SharedCache``.
+    """
+
+    def __init__(self, prefix, soft_ttl=30, hard_ttl=300, maxsize=128,
+                 backend=None, chunk_size=None):
+        self.soft_ttl = soft_ttl
+        self._cache = SharedCache(prefix, maxsize=maxsize, ttl=hard_ttl,
+                                  backend=backend, chunk_size=chunk_size)
+        # Bumped by ``invalidate``, kept next to the values so every
+        # process sees the invalidations of the others.
+        self._generations = SharedCache(prefix + ':generations',
+                                        maxsize=maxsize, ttl=hard_ttl,
+                                        backend=backend)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def peek(self, key):
+        """Return ``(value, fetched_at)`` without loading, or None."""
+        # The local copy may predate an invalidation by another process.
+        entry = self._cache.get(key, fresh=True)
+        if entry is None:
+            return None
+        fetched_at, value = entry[:2]
+        return value, fetched_at
+
+    def get(self, key, loader):
+        """Return ``(value, fetched_at)``, loading the value if needed."""
+        entry = self._cache.get(key, fresh=True)
+        if entry is None:
+            return self._load(key, loader, self._generation(key))
+        fetched_at, value, expired = entry
+        if expired or time.time() - fetched_at > self.soft_ttl:
+            self._refresh(key, loader)
+        return value, fetched_at
+
+    def _generation(self, key):
+        return self._generations.get(key, fresh=True)
+
+    def _load(self, key, loader, generation):
+        fetched_at = time.time()
+        value = loader()
+        # Do not store what was loaded before an invalidation.
+        if self._generation(key) == generation:
+            self._cache.set(key, (fetched_at, value, False))
+        return value, fetched_at
+
+    def _refresh(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        generation = self._generation(key)
+
+        def run():
+            try:
+                self._load(key, loader, generation)
+            except Exception:
+                LOG.warning("Background refresh of %s failed", key,
+                            exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def invalidate(self, key):
+        # A new random generation rather than an increment, a shared
+        # backend offers no atomic read-modify-write across processes.
+        self._generations.set(key, uuid.uuid4().hex)
+        self._cache.delete(key)
+
+    def expire(self, key):
+        """Like ``invalidate`` but keep serving the entry until reloaded.
+
+        For values too costly to reload while the caller waits.
+        """
+        entry = self._cache.get(key, fresh=True)
+        self._generations.set(key, uuid.uuid4().hex)
+        if entry is not None:
+            self._cache.set(key, entry[:2] + (True,))
+
+    def clear(self):
+        """Drop the local entries, the shared backend is left untouched."""
+        self._cache.clear()
+        self._generations.clear()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,187 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Run independent API calls concurrently.
+
+Every call receives the current request as its first argument, exactly
+like the wrappers in ``trove_dashboard.api.trove``::
+
+    instances, flavors = fanout(request, [(api.trove.instance_list, ()),
+                                          (api.trove.flavor_list, ())])
+    instances = instances.get()
+
+The calls run on a bounded, process wide thread pool. A batch shares one
+deadline; calls that did not finish in time report ``FanoutTimeout``.
+Calls that may block for long, such as rate limited writes, pass their
+own ``Executor`` so they cannot starve the reads of every page.
+"""
+import logging
+import multiprocessing
+import os
+import Queue
+import sys
+import threading
+import time
+
+from multiprocessing import pool as mp_pool
+
+from django.conf import settings
+from django.utils import translation
+
+from trove_dashboard.api import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+WORKERS = getattr(settings, 'TROVE_FANOUT_WORKERS', 10)
+TIMEOUT = getattr(settings, 'TROVE_FANOUT_TIMEOUT', 30)
+
+_local = threading.local()
+
+
+class FanoutTimeout(Exception):
+    """The call did not finish before the deadline of its batch."""
+
+
+class Result(object):
+    """Outcome of a single call: either a value or an exception."""
+
+    def __init__(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+
+    @property
+    def ok(self):
+        return self.exception is None
+
+    def get(self):
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class Executor(object):
+    """A thread pool of ``workers`` threads, created on first use."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            # Threads do not survive a fork, prefork servers need a new
+            # pool.
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = mp_pool.ThreadPool(processes=self.workers)
+                self._pid = os.getpid()
+        return self._pool
+
+
+# Shared by the reads of every request.
+default_executor = Executor(WORKERS)
+
+
+def _call(func, request, args, kwargs):
+    try:
+        return Result(value=func(request, *args, **kwargs))
+    except Exception:
+        LOG.debug("Fanout call %s failed", func.__name__, exc_info=True)
+        return Result(exception=sys.exc_info()[1])
+
+
+def _run_lane(language, request, queue, results, deadline, site):
+    _local.in_worker = True
+    metrics.set_submitter(site)
+    if language:
+        translation.activate(language)
+    try:
+        # Every lane takes the next call as soon as it is free, so a slow
+        # call holds up its own lane only.
+        while time.time() < deadline:
+            try:
+                index, (func, args, kwargs) = queue.get_nowait()
+            except Queue.Empty:
+                break
+            results[index] = _call(func, request, args, kwargs)
+        # Calls left in the queue keep an empty slot, the caller reports
+        # a timeout for them.
+    finally:
+        translation.deactivate()
+        metrics.set_submitter(None)
+        _local.in_worker = False
+
+
+def _normalize(call):
+    func = call[0]
+    args = tuple(call[1]) if len(call) > 1 else ()
+    kwargs = call[2] if len(call) > 2 else {}
+    return func, args, kwargs
+
+
+def fanout(request, calls, timeout=None, concurrency=None, executor=None):
+    """Run ``calls`` concurrently and return a ``Result`` for each of them.
+
+    ``calls`` is a sequence of ``(func, args)`` or ``(func, args, kwargs)``
+    tuples, results are returned in the same order. ``concurrency`` caps
+    the number of calls of this batch that run at the same time, they run
+    on ``executor`` or on the shared ``default_executor``.
+    """
+    calls = [_normalize(call) for call in calls]
+    if timeout is None:
+        timeout = TIMEOUT
+
+    # A call that fans out itself would wait on its own pool; run nested
+    # batches and single calls inline instead.
+    if executor is None and (len(calls) < 2
+                             or getattr(_local, 'in_worker', False)):
+        return [_call(func, request, args, kwargs)
+                for func, args, kwargs in calls]
+
+    lanes = len(calls)
+    if concurrency:
+        lanes = min(lanes, concurrency)
+    queue = Queue.Queue()
+    for item in enumerate(calls):
+        queue.put(item)
+    results = [None] * len(calls)
+    deadline = time.time() + timeout
+    language = translation.get_language()
+    # The workers' stacks end in the pool, budgets report this caller.
+    site = metrics.call_site() if metrics.capturing_sites(request) else None
+    pool = (executor or default_executor).pool()
+    pending = [pool.apply_async(_run_lane, (language, request, queue,
+                                            results, deadline, site))
+               for lane in range(lanes)]
+    for async_result in pending:
+        try:
+            async_result.get(max(deadline - time.time(), 0))
+        except multiprocessing.TimeoutError:
+            pass
+
+    timed_out = 0
+    for index, (func, args, kwargs) in enumerate(calls):
+        if results[index] is None:
+            timed_out += 1
+            results[index] = Result(exception=FanoutTimeout(
+                "%s did not finish within %ss" % (func.__name__, timeout)))
+    if timed_out:
+        LOG.warning("%s of %s fanout calls did not finish within %ss",
+                    timed_out, len(calls), timeout)
+    # Late lanes keep writing into ``results``, hand out a snapshot.
+    return list(results)
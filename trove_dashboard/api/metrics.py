@@ -0,0 +1,283 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Latency, error and payload metrics for the Trove API wrappers.
+
+Every wrapper in ``trove_dashboard.api.trove`` is decorated with
+``instrumented``. Each call is handed to the sinks configured in
+``TROVE_METRICS_SINKS``, a list of dotted class paths or
+``(path, kwargs)`` pairs::
+
+    TROVE_METRICS_SINKS = [
+        ('trove_dashboard.api.metrics.StatsdSink', {'host': 'localhost'}),
+        'trove_dashboard.api.metrics.PrometheusSink',
+    ]
+
+Without sinks the decorator only costs one function call.
+
+Requests that carry ``RequestTimings`` (see ``ServerTimingMiddleware``)
+additionally collect each of their calls.
+"""
+import collections
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import importlib
+
+
+LOG = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def _load_sink(spec):
+    if isinstance(spec, basestring):
+        spec = (spec, {})
+    path, kwargs = spec
+    module, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)(**kwargs)
+
+
+def get_sinks():
+    global _sinks
+    if _sinks is None:
+        with _sinks_lock:
+            if _sinks is None:
+                _sinks = [_load_sink(spec) for spec in
+                          getattr(settings, 'TROVE_METRICS_SINKS', [])]
+    return _sinks
+
+
+def view_name(request):
+    """Name of the view serving ``request``, used to tag the metrics."""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name:
+        if match.namespace:
+            return '%s:%s' % (match.namespace, match.url_name)
+        return match.url_name
+    # Paths carry instance and backup ids, one series per id would grow
+    # without bound.
+    return 'unknown'
+
+
+def payload_size(result):
+    """Number of resources returned by a call."""
+    if result is None:
+        return 0
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+_API_DIR = os.path.dirname(os.path.abspath(__file__))
+_local = threading.local()
+
+
+def set_submitter(site):
+    """Name ``site`` as the caller of the calls run by this thread.
+
+    ``fanout`` sets it on its workers, whose own stack ends in the pool.
+    """
+    _local.submitter = site
+
+
+def call_site():
+    """Describe the first frame of the stack outside the api package."""
+    for filename, line, function, text in reversed(
+            traceback.extract_stack()):
+        if not os.path.abspath(filename).startswith(_API_DIR):
+            if 'multiprocessing' in filename or 'threading' in filename:
+                # Calls made through fanout have no caller on the stack.
+                return getattr(_local, 'submitter', None) or 'fanout'
+            return '%s:%s in %s' % (filename, line, function)
+    return 'unknown'
+
+
+def capturing_sites(request):
+    timings = get_request_timings(request)
+    return timings is not None and timings.capture_sites
+
+
+class RequestTimings(object):
+    """Every API call and cache hit made while serving one request.
+
+    Calls are ``(operation, duration, error, site)`` tuples, ``site`` is
+    only filled in when ``capture_sites`` is set since walking the stack
+    is not free.
+    """
+
+    def __init__(self, capture_sites=False):
+        self.calls = []
+        self.cache_hits = 0
+        self.capture_sites = capture_sites
+        self.lock = threading.Lock()
+
+    def record(self, operation, duration, error):
+        site = call_site() if self.capture_sites else None
+        with self.lock:
+            self.calls.append((operation, duration, error, site))
+
+    def count(self, operation=None):
+        return len([call for call in self.calls
+                    if operation is None or call[0] == operation])
+
+    def cache_hit(self):
+        with self.lock:
+            self.cache_hits += 1
+
+    @property
+    def api_time(self):
+        return sum(call[1] for call in self.calls)
+
+
+def start_request_timings(request):
+    request._trove_timings = RequestTimings()
+    return request._trove_timings
+
+
+def get_request_timings(request):
+    return getattr(request, '_trove_timings', None)
+
+
+def cache_hit(request):
+    """Count a call answered without reaching the API."""
+    timings = get_request_timings(request)
+    if timings is not None:
+        timings.cache_hit()
+
+
+def instrumented(func):
+    """Report latency, errors and payload size of every call to the sinks.
+
+    The operation is named after the function, without leading
+    underscores, so private helpers that make the actual API call of a
+    cached wrapper report under the wrapper's name.
+    """
+    operation = func.__name__.lstrip('_')
+
+    @functools.wraps(func)
+    def wrapper(request, *args, **kwargs):
+        sinks = get_sinks()
+        timings = get_request_timings(request)
+        if not sinks and timings is None:
+            return func(request, *args, **kwargs)
+        start = time.time()
+        error = False
+        result = None
+        try:
+            result = func(request, *args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            duration = time.time() - start
+            if timings is not None:
+                timings.record(operation, duration, error)
+            view = view_name(request)
+            size = payload_size(result)
+            for sink in sinks:
+                try:
+                    sink.record(operation, view, duration, error, size)
+                except Exception:
+                    LOG.debug("Metrics sink %r failed", sink, exc_info=True)
+    return wrapper
+
+
+class StatsdSink(object):
+    """Send every call to a statsd daemon over UDP."""
+
+    def __init__(self, host='localhost', port=8125, prefix='trove_dashboard'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(0)
+
+    def _name(self, operation, view):
+        view = view.strip('/').replace(':', '.').replace('/', '.')
+        return '%s.%s.%s' % (self.prefix, operation, view or 'unknown')
+
+    def record(self, operation, view, duration, error, size):
+        name = self._name(operation, view)
+        lines = ['%s.time:%d|ms' % (name, duration * 1000),
+                 '%s.calls:1|c' % name,
+                 '%s.items:%d|h' % (name, size)]
+        if error:
+            lines.append('%s.errors:1|c' % name)
+        try:
+            self.socket.sendto('\n'.join(lines), self.address)
+        except socket.error:
+            pass
+
+
+class PrometheusSink(object):
+    """Aggregate calls in process, rendered by ``MetricsView``."""
+
+    instances = []
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = collections.defaultdict(self._new_series)
+        PrometheusSink.instances.append(self)
+
+    def _new_series(self):
+        return {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                'errors': 0, 'items': 0}
+
+    def record(self, operation, view, duration, error, size):
+        with self.lock:
+            series = self.series[(operation, view)]
+            for index, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += duration
+            series['errors'] += int(error)
+            series['items'] += size
+
+    def render(self):
+        latency = ['# TYPE trove_api_latency_seconds histogram']
+        errors = ['# TYPE trove_api_errors_total counter']
+        items = ['# TYPE trove_api_items_total counter']
+        with self.lock:
+            for (operation, view), series in sorted(self.series.items()):
+                labels = 'operation="%s",view="%s"' % (operation, view)
+                for bound, count in zip(self.buckets, series['buckets']):
+                    latency.append('trove_api_latency_seconds_bucket'
+                                   '{%s,le="%s"} %d' % (labels, bound, count))
+                latency.append('trove_api_latency_seconds_bucket'
+                               '{%s,le="+Inf"} %d' % (labels, series['count']))
+                latency.append('trove_api_latency_seconds_sum{%s} %f'
+                               % (labels, series['sum']))
+                latency.append('trove_api_latency_seconds_count{%s} %d'
+                               % (labels, series['count']))
+                errors.append('trove_api_errors_total{%s} %d'
+                              % (labels, series['errors']))
+                items.append('trove_api_items_total{%s} %d'
+                             % (labels, series['items']))
+        return '\n'.join(latency + errors + items) + '\n'
@@ -0,0 +1,208 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Keep-alive pool of trove clients.
+
+troveclient talks HTTP through httplib2, which keeps its connections open
+on the client object. Handing the same client back to later calls of the
+same user therefore reuses the TCP/TLS connection to the trove endpoint.
+A client is never shared by two threads at once: it is leased for the
+duration of one API call and returned to the pool afterwards.
+"""
+import contextlib
+import logging
+import threading
+import time
+import urlparse
+
+from troveclient import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No connection to the trove endpoint became available in time."""
+
+
+def _host(rdc):
+    return urlparse.urlparse(rdc.client.service_url or '').netloc
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def call_timeout(seconds):
+    """Bound every socket operation of the calls made in the block.
+
+    Applies to the clients leased by this thread, a call blocked longer
+    than ``seconds`` on the trove endpoint fails with ``socket.timeout``.
+    """
+    previous = getattr(_local, 'timeout', None)
+    _local.timeout = seconds
+    try:
+        yield
+    finally:
+        _local.timeout = previous
+
+
+def _set_timeout(rdc, timeout):
+    # httplib2 passes its timeout to the connections it opens, those kept
+    # alive already carry the old one on their socket.
+    rdc.client.timeout = timeout
+    for conn in getattr(rdc.client, 'connections', {}).values():
+        conn.timeout = timeout
+        if getattr(conn, 'sock', None) is not None:
+            conn.sock.settimeout(timeout)
+
+
+def _close(rdc):
+    for conn in getattr(rdc.client, 'connections', {}).values():
+        try:
+            conn.close()
+        except Exception:
+            LOG.debug("Unable to close idle trove connection", exc_info=True)
+
+
+class ClientPool(object):
+    """Pool of authenticated clients keyed by token and region.
+
+    * ``maxsize`` - idle clients kept per token and region.
+    * ``per_host`` - clients that may be in use at once per trove endpoint.
+    * ``idle_timeout`` - seconds after which an idle client is closed.
+    * ``wait_timeout`` - seconds a call waits for a free slot on a
+      saturated endpoint before ``PoolTimeout`` is raised.
+    """
+
+    def __init__(self, registry, maxsize=4, per_host=20, idle_timeout=60,
+                 wait_timeout=30):
+        self.registry = registry
+        self.maxsize = maxsize
+        self.per_host = per_host
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.created = 0
+        self.reused = 0
+        self.closed = 0
+        self.saturated = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._idle = {}
+        self._active = {}
+        self._cond = threading.Condition()
+
+    def _purge(self):
+        limit = time.time() - self.idle_timeout
+        for key, idle in list(self._idle.items()):
+            fresh = []
+            for rdc, last_used in idle:
+                if last_used > limit:
+                    fresh.append((rdc, last_used))
+                else:
+                    _close(rdc)
+                    self.closed += 1
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+    def _checkout(self, request, key):
+        rdc = None
+        with self._cond:
+            self._purge()
+            idle = self._idle.get(key)
+            if idle:
+                rdc = idle.pop()[0]
+                self.reused += 1
+        if rdc is None:
+            # Authenticating may call keystone, keep it out of the lock.
+            rdc = self.registry.get(request)
+            with self._cond:
+                self.created += 1
+
+        host = _host(rdc)
+        start = time.time()
+        with self._cond:
+            if self._active.get(host, 0) >= self.per_host:
+                self.saturated += 1
+            while self._active.get(host, 0) >= self.per_host:
+                remaining = start + self.wait_timeout - time.time()
+                if remaining <= 0:
+                    # The client was never handed out, do not leak it.
+                    _close(rdc)
+                    self.closed += 1
+                    raise PoolTimeout("Timed out waiting for a connection "
+                                      "to %s" % host)
+                self._cond.wait(remaining)
+            self._active[host] = self._active.get(host, 0) + 1
+            waited = time.time() - start
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        return rdc, host
+
+    def _checkin(self, key, rdc, host, discard=False):
+        with self._cond:
+            self._active[host] -= 1
+            idle = self._idle.setdefault(key, [])
+            if discard or len(idle) >= self.maxsize:
+                _close(rdc)
+                self.closed += 1
+            else:
+                idle.append((rdc, time.time()))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def lease(self, request):
+        """Lend a client for the duration of the ``with`` block."""
+        key = self.registry.key(request)
+        rdc, host = self._checkout(request, key)
+        discard = False
+        timeout = getattr(_local, 'timeout', None)
+        if timeout:
+            default_timeout = getattr(rdc.client, 'timeout', None)
+            _set_timeout(rdc, timeout)
+        try:
+            yield rdc
+        except exceptions.ClientException:
+            # An API error, the connection itself is still usable.
+            raise
+        except Exception:
+            discard = True
+            raise
+        finally:
+            if timeout and not discard:
+                _set_timeout(rdc, default_timeout)
+            self._checkin(key, rdc, host, discard=discard)
+
+    def clear(self):
+        with self._cond:
+            for idle in self._idle.values():
+                for rdc, last_used in idle:
+                    _close(rdc)
+            self._idle.clear()
+
+    def stats(self):
+        with self._cond:
+            return {'created': self.created,
+                    'reused': self.reused,
+                    'closed': self.closed,
+                    'saturated': self.saturated,
+                    'wait_time': self.wait_time,
+                    'max_wait_time': self.max_wait_time,
+                    'active': dict(self._active),
+                    'idle': sum(len(i) for i in self._idle.values())}
@@ -0,0 +1,72 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Rate limiting of the calls the panels make toward Trove.
+
+Bulk actions can issue hundreds of writes for a single form submission.
+A ``RateLimiter`` spreads them out per key, typically the project, so one
+user cleaning up backups does not flood the API::
+
+    limiter = RateLimiter(rate=10, burst=20)
+    if limiter.acquire(request.user.tenant_id, deadline):
+        api.trove.backup_delete(request, backup_id)
+"""
+import threading
+import time
+
+from trove_dashboard.api import cache
+
+
+class RateLimiter(object):
+    """Token bucket of ``rate`` calls per second and ``burst`` per key.
+
+    A ``rate`` of ``0`` or ``None`` disables the limiter. Buckets of keys
+    that have not been used for a while are dropped.
+    """
+
+    def __init__(self, rate, burst=None, maxsize=1000):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self._buckets = cache.TTLCache(maxsize=maxsize, ttl=3600)
+        self._lock = threading.Lock()
+
+    def _take(self, key, tokens):
+        with self._lock:
+            now = time.time()
+            available, last = self._buckets.get(key, (self.burst, now))
+            available = min(self.burst,
+                            available + (now - last) * self.rate)
+            available -= tokens
+            self._buckets.set(key, (available, now))
+        return available
+
+    def acquire(self, key, deadline=None):
+        """Wait for a call slot, False if none is free before ``deadline``.
+
+        ``deadline`` is an absolute epoch timestamp.
+        """
+        if not self.rate:
+            return True
+        available = self._take(key, 1)
+        wait = max(0, -available / float(self.rate))
+        if deadline is not None and time.time() + wait > deadline:
+            # Give the slot back, the caller will not use it.
+            self._take(key, -1)
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
@@ -0,0 +1,169 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In memory search over the instances or backups of a project.
+
+The pickers of the workflows look objects up by the start of their name
+instead of rendering every one of them into the form::
+
+    index = PrefixIndex(backup._info for backup in backups)
+    objects, more = index.search('nightly', offset=0, limit=20)
+"""
+import bisect
+import itertools
+import re
+
+
+_WORD_SPLIT = re.compile(r'[\s\-_.:/]+')
+
+
+def _keys(name, obj_id):
+    name = name.lower()
+    keys = set([name, obj_id.lower()])
+    keys.update(word for word in _WORD_SPLIT.split(name) if word)
+    return keys
+
+
+class PrefixIndex(object):
+    """Objects (``_info`` dicts) sorted by the prefixes of their names.
+
+    An object is found by the start of its name, of any word in its name
+    or of its id, case insensitively.
+    """
+
+    def __init__(self, objects, name_key='name'):
+        self._by_id = {}
+        self._keys = []
+        for obj in objects:
+            obj_id = str(obj['id'])
+            self._by_id[obj_id] = obj
+            for key in _keys(obj.get(name_key) or '', obj_id):
+                self._keys.append((key, obj_id))
+        self._keys.sort()
+        self._sorted = sorted(self._by_id,
+                              key=lambda obj_id: (
+                                  (self._by_id[obj_id].get(name_key)
+                                   or '').lower(), obj_id))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, obj_id):
+        return self._by_id.get(str(obj_id))
+
+    def search(self, query, offset=0, limit=20):
+        """Return ``(objects, more)`` for one page of the matches.
+
+        An empty query matches everything, in name order.
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            page = self._sorted[offset:offset + limit + 1]
+        else:
+            found = []
+            seen = set()
+            start = bisect.bisect_left(self._keys, (query,))
+            for key, obj_id in itertools.islice(self._keys, start, None):
+                if not key.startswith(query) or len(found) > offset + limit:
+                    break
+                if obj_id not in seen:
+                    seen.add(obj_id)
+                    found.append(obj_id)
+            page = found[offset:offset + limit + 1]
+        return ([self._by_id[obj_id] for obj_id in page[:limit]],
+                len(page) > limit)
+
+
+def _flavor_id(info):
+    return str((info.get('flavor') or {}).get('id', ''))
+
+
+class Query(object):
+    """Filters and sort order of an index page, from its GET parameters.
+
+    ``q`` matches a substring of the name, ``status``, ``flavor`` and
+    ``instance`` (the instance of a backup) match exactly, and
+    ``created_after`` / ``created_before`` take ISO dates and are
+    inclusive. ``sort`` is one of ``SORT_KEYS``, ``-`` in front reverses
+    it. The Trove API only pages, so everything runs over the cached list
+    of every object of the project.
+    """
+    FILTERS = ('q', 'status', 'flavor', 'instance', 'created_after',
+               'created_before')
+    SORT_KEYS = ('name', 'status', 'created', 'updated')
+
+    def __init__(self, params):
+        self.filters = dict((name, params.get(name, '').strip())
+                            for name in self.FILTERS
+                            if params.get(name, '').strip())
+        sort = params.get('sort', '').strip()
+        if sort.lstrip('-') not in self.SORT_KEYS:
+            sort = ''
+        self.sort = sort
+
+    def __nonzero__(self):
+        return bool(self.filters or self.sort)
+
+    __bool__ = __nonzero__
+
+    def matches(self, info):
+        filters = self.filters
+        if 'q' in filters and (filters['q'].lower()
+                               not in (info.get('name') or '').lower()):
+            return False
+        if ('status' in filters
+                and (info.get('status') or '').upper()
+                != filters['status'].upper()):
+            return False
+        if 'flavor' in filters and _flavor_id(info) != filters['flavor']:
+            return False
+        if ('instance' in filters
+                and info.get('instance_id') != filters['instance']):
+            return False
+        created = info.get('created') or ''
+        after = filters.get('created_after')
+        if after and created[:len(after)] < after:
+            return False
+        before = filters.get('created_before')
+        if before and created[:len(before)] > before:
+            return False
+        return True
+
+    def apply(self, infos):
+        """The matching ``infos`` in the requested order."""
+        found = [info for info in infos if self.matches(info)]
+        if self.sort:
+            key = self.sort.lstrip('-')
+            found.sort(key=lambda info: ((info.get(key) or ''),
+                                         info['id']),
+                       reverse=self.sort.startswith('-'))
+        return found
+
+    def page(self, infos, marker=None, limit=20):
+        """Return ``(page, next_marker)`` of the results after ``marker``.
+
+        ``marker`` is the id of the last object of the previous page.
+        """
+        start = 0
+        if marker:
+            for position, info in enumerate(infos):
+                if info['id'] == marker:
+                    start = position + 1
+                    break
+        page = infos[start:start + limit]
+        more = len(infos) > start + limit
+        return page, page[-1]['id'] if more and page else None
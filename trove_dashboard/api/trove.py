@@ -3,10 +3,28 @@ Simple Trove API
 ===================
 This is meant to be a simple wrapper around the Trove API.
 """
+import calendar
+import functools
+import logging
+import threading
 
+from django.conf import settings
+
+from troveclient import backups as trove_backups
 from troveclient import client
+from troveclient import exceptions
+from troveclient import flavors as trove_flavors
+from troveclient import instances as trove_instances
 from troveclient.auth import ServiceCatalog
 
+from trove_dashboard.api import cache
+from trove_dashboard.api import metrics
+from trove_dashboard.api import pool
+from trove_dashboard.api import search
+
+
+LOG = logging.getLogger(__name__)
+
 
 class TokenAuth(object):
     """Simple Token Authentication handler for trove api"""
@@ -32,81 +50,568 @@ class TokenAuth(object):
                               service_name=self.service_name)
 
 
+def _token_expires(token):
+    """Return the token expiry as an epoch timestamp or None."""
+    expires = getattr(token, 'expires', None)
+    if expires is None:
+        return None
+    return calendar.timegm(expires.utctimetuple())
+
+
+class ClientRegistry(object):
+    """Hands out authenticated trove clients.
+
+    Authenticating a client parses the whole service catalog of the user,
+    so the resulting token and endpoint are kept per token id and region
+    and replayed on every new client. Entries leave the registry when the
+    token expires or when the LRU bound is reached.
+    """
+
+    def __init__(self, maxsize=100, ttl=None):
+        self._auth = cache.TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, request):
+        return (request.user.token.id,
+                getattr(request.user, 'services_region', None))
+
+    def _build(self, request):
+        return client.Dbaas(username=request.user,
+                            api_key=None,
+                            auth_strategy=TokenAuth)
+
+    def get(self, request):
+        key = self.key(request)
+        rdc = self._build(request)
+        auth = self._auth.get(key)
+        if auth is None:
+            rdc.client.authenticate()
+            auth = (rdc.client.auth_token, rdc.client.service_url)
+            self._auth.set(key, auth,
+                           expires=_token_expires(request.user.token))
+        else:
+            rdc.client.auth_token, rdc.client.service_url = auth
+        return rdc
+
+    def invalidate(self, request):
+        self._auth.delete(self.key(request))
+
+    def clear(self):
+        self._auth.clear()
+
+    def stats(self):
+        return self._auth.stats()
+
+
+registry = ClientRegistry(
+    maxsize=getattr(settings, 'TROVE_CLIENT_CACHE_SIZE', 100),
+    ttl=getattr(settings, 'TROVE_CLIENT_CACHE_TTL', None))
+
+
+client_pool = pool.ClientPool(
+    registry,
+    maxsize=getattr(settings, 'TROVE_CLIENT_POOL_SIZE', 4),
+    per_host=getattr(settings, 'TROVE_CLIENT_POOL_PER_HOST', 20),
+    idle_timeout=getattr(settings, 'TROVE_CLIENT_POOL_IDLE_TIMEOUT', 60),
+    wait_timeout=getattr(settings, 'TROVE_CLIENT_POOL_WAIT_TIMEOUT', 30))
+
+
+class FlavorCache(object):
+    """Process wide cache of the flavor list of a region and tenant.
+
+    Only the raw ``_info`` of every flavor is kept, so cached entries hold
+    no reference to a client and can live in a shared Django cache.
+    """
+
+    def __init__(self, maxsize=64, ttl=300, backend=None):
+        self._cache = cache.SharedCache('trove_dashboard:flavors',
+                                        maxsize=maxsize, ttl=ttl,
+                                        backend=backend)
+
+    def _key(self, request):
+        return (getattr(request.user, 'services_region', None),
+                request.user.tenant_id)
+
+    def get(self, request):
+        infos = self._cache.get(self._key(request))
+        if infos is None:
+            return None
+        return [trove_flavors.Flavor(None, info, loaded=True)
+                for info in infos]
+
+    def find(self, request, flavor_id):
+        for flavor in self.get(request) or []:
+            if str(flavor.id) == str(flavor_id):
+                return flavor
+        return None
+
+    def set(self, request, flavors):
+        self._cache.set(self._key(request), [f._info for f in flavors])
+
+    def invalidate(self, request):
+        self._cache.delete(self._key(request))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+flavor_cache = FlavorCache(
+    maxsize=getattr(settings, 'TROVE_FLAVOR_CACHE_SIZE', 64),
+    ttl=getattr(settings, 'TROVE_FLAVOR_CACHE_TTL', 300),
+    backend=getattr(settings, 'TROVE_FLAVOR_CACHE_BACKEND', None))
+
+
+class Page(list):
+    """A page of resources, ``next`` is the marker of the following page."""
+
+    def __init__(self, items, next=None, fetched_at=None):
+        super(Page, self).__init__(items)
+        self.next = next
+        self.fetched_at = fetched_at
+
+
+LIST_CACHE = getattr(settings, 'TROVE_LIST_CACHE', False)
+
+# First pages of the index tables, see ``cached_list``.
+list_cache = cache.StaleCache(
+    'trove_dashboard:lists',
+    soft_ttl=getattr(settings, 'TROVE_LIST_CACHE_SOFT_TTL', 30),
+    hard_ttl=getattr(settings, 'TROVE_LIST_CACHE_HARD_TTL', 300),
+    maxsize=getattr(settings, 'TROVE_LIST_CACHE_SIZE', 1000),
+    backend=getattr(settings, 'TROVE_LIST_CACHE_BACKEND', None),
+    chunk_size=getattr(settings, 'TROVE_LIST_CACHE_CHUNK_SIZE', 512 * 1024))
+
+# Page size used to walk every instance or backup, see ``cached_all``.
+INDEX_PAGE_SIZE = getattr(settings, 'TROVE_INDEX_PAGE_SIZE', 1000)
+
+# Entries of ``list_cache`` holding whole lists. Writes expire them
+# rather than drop them, they are reloaded in the background.
+_INDEX_KINDS = ('instance_index', 'backup_index')
+
+_LIST_RESOURCES = {'instances': trove_instances.Instance,
+                   'backups': trove_backups.Backup}
+
+
+def _list_key(request, kind):
+    return (kind, getattr(request.user, 'services_region', None),
+            request.user.tenant_id)
+
+
+def cached_list(request, kind, limit=None):
+    """First page of ``instances`` or ``backups``, possibly stale.
+
+    The page is served from ``list_cache`` and refreshed in the background
+    once it is older than the soft TTL. ``fetched_at`` on the returned
+    page tells how old it is. Writes through this module invalidate it.
+    """
+    list_func = {'instances': instance_list, 'backups': backup_list}[kind]
+
+    def load():
+        page = list_func(request, limit=limit)
+        return {'limit': limit,
+                'items': [item._info for item in page],
+                'next': getattr(page, 'next', None)}
+
+    key = _list_key(request, kind)
+    value, fetched_at = list_cache.get(key, load)
+    if value['limit'] != limit:
+        list_cache.invalidate(key)
+        value, fetched_at = list_cache.get(key, load)
+    resource_class = _LIST_RESOURCES[kind]
+    return Page([resource_class(None, info, loaded=True)
+                 for info in value['items']],
+                next=value['next'], fetched_at=fetched_at)
+
+
+def cached_all(request, kind):
+    """``_info`` of every instance or backup of the project, possibly stale.
+
+    Returns ``(infos, fetched_at)``. Shares ``list_cache`` with
+    ``cached_list``, only a cold cache makes the caller wait for the walk.
+    """
+    list_all, cache_kind = {'instances': (instance_list_all,
+                                          'instance_index'),
+                            'backups': (backup_list_all,
+                                        'backup_index')}[kind]
+
+    def load():
+        return [item._info for item in list_all(request,
+                                                page_size=INDEX_PAGE_SIZE,
+                                                keep=False)]
+
+    return list_cache.get(_list_key(request, cache_kind), load)
+
+
+# ``_info`` of every instance of the project by id, per fetch of the
+# underlying list.
+instance_infos = cache.TTLCache(
+    maxsize=getattr(settings, 'TROVE_SEARCH_INDEX_SIZE', 100),
+    ttl=getattr(settings, 'TROVE_LIST_CACHE_HARD_TTL', 300))
+
+
+def cached_instances(request, instance_ids):
+    """The instances among ``instance_ids`` by id, possibly stale.
+
+    Ids missing from the cached list are left out.
+    """
+    infos, fetched_at = cached_all(request, 'instances')
+    key = _list_key(request, 'instances') + (fetched_at,)
+    by_id = instance_infos.get(key)
+    if by_id is None:
+        by_id = instance_infos.set(key, dict((info['id'], info)
+                                             for info in infos))
+    instances = {}
+    for instance_id in set(instance_ids):
+        if instance_id in by_id:
+            instances[instance_id] = trove_instances.Instance(
+                None, by_id[instance_id], loaded=True)
+    return instances
+
+
+def query_list(request, kind, query, marker=None, limit=None):
+    """A page of the instances or backups matching a ``search.Query``.
+
+    Runs over ``cached_all``, the Trove API has no filters to push it to.
+    """
+    infos, fetched_at = cached_all(request, kind)
+    infos, next_marker = query.page(query.apply(infos), marker=marker,
+                                    limit=limit or len(infos))
+    resource_class = _LIST_RESOURCES[kind]
+    return Page([resource_class(None, info, loaded=True) for info in infos],
+                next=next_marker, fetched_at=fetched_at)
+
+
+# Search indexes built from the entries of ``list_cache``.
+search_indexes = cache.TTLCache(
+    maxsize=getattr(settings, 'TROVE_SEARCH_INDEX_SIZE', 100),
+    ttl=getattr(settings, 'TROVE_LIST_CACHE_HARD_TTL', 300))
+
+
+def search_index(request, kind):
+    """``search.PrefixIndex`` over every instance or backup of the project.
+
+    The index is built once per fetch of the underlying list.
+    """
+    infos, fetched_at = cached_all(request, kind)
+    key = _list_key(request, kind) + (fetched_at,)
+    index = search_indexes.get(key)
+    if index is None:
+        index = search_indexes.set(key, search.PrefixIndex(infos))
+    return index
+
+
+def invalidate_lists(request, *kinds):
+    for kind in kinds:
+        if kind in _INDEX_KINDS:
+            list_cache.expire(_list_key(request, kind))
+        else:
+            list_cache.invalidate(_list_key(request, kind))
+
+
+# Ids the API recently answered with "Not Found", per project and kind.
+not_found = cache.TTLCache(
+    maxsize=getattr(settings, 'TROVE_NOT_FOUND_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TROVE_NOT_FOUND_CACHE_TTL', 60))
+
+
+def _not_found_key(request, kind, obj_id):
+    return (request.user.tenant_id, kind, str(obj_id))
+
+
+def remember_not_found(request, kind, obj_id, ttl=None):
+    not_found.set(_not_found_key(request, kind, obj_id), True, ttl=ttl)
+
+
+def is_not_found(request, kind, obj_id):
+    return not_found.get(_not_found_key(request, kind, obj_id), False)
+
+
+class RequestMemo(object):
+    """Results of the read calls made while serving one request.
+
+    The memo lives on the request object and goes away with it.
+    ``deduplicated`` counts the calls answered from the memo.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.deduplicated = 0
+        self.lock = threading.Lock()
+
+    def forget(self, *prefixes):
+        """Drop every entry whose key starts with one of ``prefixes``."""
+        with self.lock:
+            for key in list(self.results):
+                for prefix in prefixes:
+                    if key[:len(prefix)] == prefix:
+                        del self.results[key]
+                        break
+
+
+REQUEST_MEMO = getattr(settings, 'TROVE_REQUEST_MEMO', True)
+_memo_lock = threading.Lock()
+
+
+def get_memo(request):
+    memo = getattr(request, '_trove_memo', None)
+    if memo is None:
+        with _memo_lock:
+            memo = getattr(request, '_trove_memo', None)
+            if memo is None:
+                memo = request._trove_memo = RequestMemo()
+    return memo
+
+
+def memoized(func):
+    """Answer repeated identical reads within a request from a memo."""
+    @functools.wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if not REQUEST_MEMO:
+            return func(request, *args, **kwargs)
+        memo = get_memo(request)
+        key = (func.__name__,) + args + (tuple(sorted(kwargs.items())),)
+        with memo.lock:
+            if key in memo.results:
+                memo.deduplicated += 1
+                metrics.cache_hit(request)
+                LOG.debug("Deduplicated %s%r", func.__name__, args)
+                return memo.results[key]
+        result = func(request, *args, **kwargs)
+        with memo.lock:
+            memo.results[key] = result
+        return result
+    return wrapper
+
+
+def forget(request, *prefixes):
+    """Invalidate memoized reads after a write.
+
+    Every prefix is a tuple of a wrapper name followed by leading
+    arguments, ``('instance_get', instance_id)`` or ``('backup_list',)``.
+    """
+    get_memo(request).forget(*prefixes)
+
+
 def rdclient(request):
-    rdc = client.Dbaas(username=request.user,
-                       api_key=None,
-                       auth_strategy=TokenAuth)
-    return rdc
+    """Return an authenticated client that is not part of the pool."""
+    return registry.get(request)
 
 
+@memoized
+@metrics.instrumented
 def instance_list(request, limit=None, marker=None):
-    return rdclient(request).instances.list(limit=limit, marker=marker)
+    with client_pool.lease(request) as rdc:
+        return rdc.instances.list(limit=limit, marker=marker)
 
 
-def instance_get(request, instance_id):
-    return rdclient(request).instances.get(instance_id)
+def _list_all(list_func, request, page_size, keep=True):
+    marker = None
+    while True:
+        page = list_func(request, limit=page_size, marker=marker)
+        if not keep:
+            # Streaming callers hold a single page, the memo must not
+            # collect all of them.
+            forget(request, (list_func.__name__,))
+        for item in page:
+            yield item
+        marker = getattr(page, 'next', None)
+        if not page or not marker:
+            break
 
 
-def instance_delete(request, instance_id):
-    return rdclient(request).instances.delete(instance_id)
+def instance_list_all(request, page_size=None, keep=True):
+    """Yield every instance of the project, fetching one page at a time.
+
+    With ``keep=False`` the pages are not kept in the request memo.
+    """
+    return _list_all(instance_list, request, page_size, keep)
+
+
+@memoized
+@metrics.instrumented
+def instance_get(request, instance_id):
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.instances.get(instance_id)
+    except exceptions.NotFound:
+        remember_not_found(request, 'instance', instance_id)
+        raise
 
 
+@metrics.instrumented
+def instance_delete(request, instance_id):
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.instances.delete(instance_id)
+    finally:
+        # Only after the call, a list loaded while it ran is stale too.
+        forget(request, ('instance_list',),
+               ('instance_get', instance_id),
+               ('instance_backups', instance_id))
+        invalidate_lists(request, 'instances', 'instance_index', 'backups',
+                         'backup_index')
+
+
+@metrics.instrumented
 def instance_create(request, name, volume, flavor, databases=None, users=None,
                     restore_point=None):
     vol = {'size': volume}
-    return rdclient(request).instances.create(name, flavor, vol,
-                                              databases=databases,
-                                              users=users,
-                                              restorePoint=restore_point)
-
-
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.instances.create(name, flavor, vol,
+                                        databases=databases,
+                                        users=users,
+                                        restorePoint=restore_point)
+    finally:
+        forget(request, ('instance_list',))
+        invalidate_lists(request, 'instances', 'instance_index')
+
+
+@memoized
+@metrics.instrumented
 def instance_backups(request, instance_id):
-    return rdclient(request).instances.backups(instance_id)
+    with client_pool.lease(request) as rdc:
+        return rdc.instances.backups(instance_id)
 
 
+@metrics.instrumented
 def instance_restart(request, instance_id):
-    return rdclient(request).instances.restart(instance_id)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.instances.restart(instance_id)
+    finally:
+        forget(request, ('instance_list',), ('instance_get', instance_id))
+        invalidate_lists(request, 'instances', 'instance_index')
 
 
+@memoized
+@metrics.instrumented
 def database_list(request, instance_id):
-    return rdclient(request).databases.list(instance_id)
+    with client_pool.lease(request) as rdc:
+        return rdc.databases.list(instance_id)
 
 
+@metrics.instrumented
 def database_delete(request, instance_id, db_name):
-    return rdclient(request).databases.delete(instance_id, db_name)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.databases.delete(instance_id, db_name)
+    finally:
+        forget(request, ('database_list', instance_id))
 
 
+@memoized
+@metrics.instrumented
 def backup_list(request, limit=None, marker=None):
-    return rdclient(request).backups.list()
+    with client_pool.lease(request) as rdc:
+        return rdc.backups.list(limit=limit, marker=marker)
+
+
+def backup_list_all(request, page_size=None, keep=True):
+    """Yield every backup of the project, fetching one page at a time."""
+    return _list_all(backup_list, request, page_size, keep)
 
 
+@memoized
+@metrics.instrumented
 def backup_get(request, backup_id):
-    return rdclient(request).backups.get(backup_id)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.backups.get(backup_id)
+    except exceptions.NotFound:
+        remember_not_found(request, 'backup', backup_id)
+        raise
 
 
+@metrics.instrumented
 def backup_delete(request, backup_id):
-    return rdclient(request).backups.delete(backup_id)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.backups.delete(backup_id)
+    finally:
+        forget(request, ('backup_list',), ('backup_get', backup_id),
+               ('instance_backups',))
+        invalidate_lists(request, 'backups', 'backup_index')
 
 
+@metrics.instrumented
 def backup_create(request, name, instance_id, description=None):
-    return rdclient(request).backups.create(name, instance_id, description)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.backups.create(name, instance_id, description)
+    finally:
+        forget(request, ('backup_list',), ('instance_backups', instance_id))
+        invalidate_lists(request, 'backups', 'backup_index')
 
 
+@metrics.instrumented
+def _flavor_list(request):
+    with client_pool.lease(request) as rdc:
+        return rdc.flavors.list()
+
+
+@metrics.instrumented
+def _flavor_get(request, flavor_id):
+    with client_pool.lease(request) as rdc:
+        return rdc.flavors.get(flavor_id)
+
+
+@memoized
 def flavor_list(request):
-    return rdclient(request).flavors.list()
+    flavors = flavor_cache.get(request)
+    if flavors is None:
+        flavors = _flavor_list(request)
+        flavor_cache.set(request, flavors)
+    else:
+        metrics.cache_hit(request)
+    return flavors
 
 
-def flavor_get(request, flavor_id):
-    return rdclient(request).flavors.get(flavor_id)
+# Seconds a flavor that could not be fetched is not asked for again.
+FLAVOR_FAILURE_TTL = getattr(settings, 'TROVE_FLAVOR_FAILURE_TTL', 30)
 
 
+@memoized
+def flavor_get(request, flavor_id):
+    # Filling the index with one list call is cheaper than a get per row.
+    flavor_list(request)
+    flavor = flavor_cache.find(request, flavor_id)
+    if flavor is not None:
+        return flavor
+    # Retired or broken flavors fail on every page, don't keep asking.
+    if is_not_found(request, 'flavor', flavor_id):
+        metrics.cache_hit(request)
+        raise exceptions.NotFound(404, "Flavor %s recently failed to load"
+                                  % flavor_id)
+    try:
+        return _flavor_get(request, flavor_id)
+    except Exception:
+        remember_not_found(request, 'flavor', flavor_id,
+                           ttl=FLAVOR_FAILURE_TTL)
+        raise
+
+
+@memoized
+@metrics.instrumented
 def users_list(request, instance_id):
-    return rdclient(request).users.list(instance_id)
+    with client_pool.lease(request) as rdc:
+        return rdc.users.list(instance_id)
 
 
+@metrics.instrumented
 def user_delete(request, instance_id, user):
-    return rdclient(request).users.delete(instance_id, user)
+    try:
+        with client_pool.lease(request) as rdc:
+            return rdc.users.delete(instance_id, user)
+    finally:
+        forget(request, ('users_list', instance_id),
+               ('user_list_access', instance_id))
 
 
+@memoized
+@metrics.instrumented
 def user_list_access(request, instance_id, user):
-    return rdclient(request).users.list_access(instance_id, user)
+    with client_pool.lease(request) as rdc:
+        return rdc.users.list_access(instance_id, user)
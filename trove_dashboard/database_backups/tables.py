@@ -24,6 +24,9 @@ from horizon import tables
 from horizon.utils.filters import replace_underscores
 
 from trove_dashboard import api
+from trove_dashboard.actions import ConcurrentBatchAction
+from trove_dashboard.actions import ExportLink
+from trove_dashboard.tables import QueryPaginationMixin
 from django.core import urlresolvers
 
 
@@ -58,7 +61,7 @@ class RestoreLink(tables.LinkAction):
         return url + '?backup=%s' % datam.id
 
 
-class DeleteBackup(tables.BatchAction):
+class DeleteBackup(ConcurrentBatchAction):
     name = "delete"
     action_present = _("Delete")
     action_past = _("Scheduled deletion of")
@@ -101,7 +104,11 @@ def db_name(obj):
     return obj.instance_id
 
 
-class BackupsTable(tables.DataTable):
+class ExportBackups(ExportLink):
+    url = "horizon:project:database_backups:export"
+
+
+class BackupsTable(QueryPaginationMixin, tables.DataTable):
     STATUS_CHOICES = (
         ("BUILDING", None),
         ("COMPLETED", True),
@@ -131,5 +138,5 @@ class BackupsTable(tables.DataTable):
         verbose_name = _("Backups")
         status_columns = ["status"]
         row_class = UpdateRow
-        table_actions = (LaunchLink, DeleteBackup)
+        table_actions = (LaunchLink, ExportBackups, DeleteBackup)
         row_actions = (RestoreLink, DeleteBackup)
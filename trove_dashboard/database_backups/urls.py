@@ -16,11 +16,21 @@
 
 from django.conf.urls.defaults import patterns, url
 
-from .views import IndexView, BackupView, DetailView
+from trove_dashboard.views import JobProgressView
+from .views import IndexView, BackupView, BulkBackupView, DetailView, \
+    RowsView, BackupSearchView, BackupsExportView
 
 urlpatterns = patterns(
     '',
     url(r'^$', IndexView.as_view(), name='index'),
     url(r'^create$', BackupView.as_view(), name='create'),
+    url(r'^create_many/(?P<selection>[0-9a-f]+)$', BulkBackupView.as_view(),
+        name='create_many'),
+    url(r'^jobs/(?P<job_id>[^/]+)$', JobProgressView.as_view(),
+        name='job'),
+    url(r'^rows$', RowsView.as_view(), name='rows'),
+    url(r'^search$', BackupSearchView.as_view(), name='search'),
+    url(r'^export\.(?P<format>csv|json)$', BackupsExportView.as_view(),
+        name='export'),
     url(r'^(?P<backup_id>[^/]+)/$', DetailView.as_view(), name='detail'),
 )
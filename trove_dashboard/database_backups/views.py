@@ -19,6 +19,8 @@ Views for displaying database backups.
 """
 import logging
 
+from django.conf import settings
+from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 
 from horizon import tables
@@ -26,57 +28,153 @@ from horizon import workflows
 from horizon.views import APIView
 
 from trove_dashboard import api
+from trove_dashboard import jobs
+from trove_dashboard import rows
+from trove_dashboard.tables import filter_fields
+from trove_dashboard.tables import sort_choices
+from trove_dashboard.views import BatchRowUpdateView
+from trove_dashboard.views import SearchView
+from trove_dashboard.views import data_age
+from trove_dashboard.views import ExportView
 from .tables import BackupsTable
 from .workflows import CreateBackup
+from .workflows import CreateBackups
 from horizon import exceptions
 
 LOG = logging.getLogger(__name__)
 
+PAGE_SIZE = getattr(settings, 'TROVE_BACKUP_PAGE_SIZE',
+                    getattr(settings, 'API_RESULT_PAGE_SIZE', 20))
 
-class IndexView(tables.DataTableView):
+
+def _fetch_instances(request, backups, instances=None):
+    """Add the instances of ``backups`` missing from ``instances``.
+
+    Every missing id is fetched once, concurrently, ids the API recently
+    reported as gone are skipped.
+    """
+    instances = instances or {}
+    missing = set(b.instance_id for b in backups
+                  if b.instance_id) - set(instances)
+    missing = [instance_id for instance_id in missing
+               if not api.trove.is_not_found(request, 'instance',
+                                             instance_id)]
+    results = api.fanout.fanout(
+        request, [(api.trove.instance_get, (instance_id,))
+                  for instance_id in missing])
+    for instance_id, result in zip(missing, results):
+        if result.ok:
+            instances[instance_id] = result.value
+    return instances
+
+
+class IndexView(api.budget.ApiBudgetMixin, tables.DataTableView):
     table_class = BackupsTable
     template_name = 'project/database_backups/index.html'
+    # Only instances missing from the instance list are fetched one by one.
+    api_budget = api.budget.CallBudget(backup_list=1, instance_get=5)
+    # Filtering walks every page of the backup list on a cache miss.
+    filtered_budget = api.budget.CallBudget(instance_get=5)
 
     def has_more_data(self, table):
         return self._more
 
-    def _get_extra_data(self, backup):
-        """Apply extra info to the backup."""
-        instance_id = backup.instance_id
-        if not hasattr(self, '_instances'):
-            self._instances = {}
-        instance = self._instances.get(instance_id)
-        if instance is None:
-            try:
-                instance = api.trove.instance_get(self.request, instance_id)
-            except:
-                instance = _('Not Found')
-        backup.instance = instance
-        return backup
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['data_age'] = data_age(getattr(self, '_fetched_at', None))
+        statuses = [(status, status) for status, ok in
+                    BackupsTable.STATUS_CHOICES]
+        context['filters'] = filter_fields(
+            self.request, [('q', _('Name'), None),
+                           ('status', _('Status'), statuses),
+                           ('instance', _('Instance ID'), None),
+                           ('created_after', _('Created after'), 'date'),
+                           ('created_before', _('Created before'), 'date')])
+        context['sort_choices'] = sort_choices([('name', _('Name')),
+                                                ('status', _('Status')),
+                                                ('created', _('Created'))])
+        context['sort'] = self.request.GET.get('sort', '')
+        context['filtered'] = bool(api.search.Query(self.request.GET))
+        job_id = self.request.GET.get('job')
+        if job_id:
+            context['job_url'] = reverse(
+                'horizon:project:database_backups:job', args=(job_id,))
+        return context
+
+    def _get_instances(self, backups):
+        """Index the instances referenced by ``backups`` by id.
+
+        The cached list of every instance of the project resolves the
+        live ones, so the instance list is walked at most once per cache
+        lifetime and not for every page. The few ids missing from it are
+        fetched on their own.
+        """
+        try:
+            instances = api.trove.cached_instances(
+                self.request, [backup.instance_id for backup in backups])
+        except:
+            instances = {}
+            LOG.exception("Exception while obtaining instances for backups")
+        return _fetch_instances(self.request, backups, instances)
 
     def get_data(self):
         marker = self.request.GET.get(BackupsTable._meta.pagination_param)
         try:
-            backups = api.trove.backup_list(self.request, marker=marker)
-            backups = map(self._get_extra_data, backups)
-            LOG.info(msg=_("Obtaining all backups "
+            query = api.search.Query(self.request.GET)
+            if query:
+                self.api_budget = self.filtered_budget
+                backups = api.trove.query_list(self.request, 'backups',
+                                               query, marker=marker,
+                                               limit=PAGE_SIZE)
+            elif api.trove.LIST_CACHE and marker is None:
+                backups = api.trove.cached_list(self.request, 'backups',
+                                                limit=PAGE_SIZE)
+            else:
+                backups = api.trove.backup_list(self.request,
+                                                limit=PAGE_SIZE,
+                                                marker=marker)
+            self._more = bool(getattr(backups, 'next', None))
+            self._fetched_at = getattr(backups, 'fetched_at', None)
+            instances = self._get_instances(backups)
+            backups = rows.backup_rows(backups, instances, _('Not Found'))
+            LOG.info(msg=_("Obtaining a page of backups "
                            "at %s class" % repr(IndexView.__class__)))
-            self._more = False
-        # TODO: (rmyers) Pagination is broken in trove api.trove.
         except:
             self._more = False
             backups = []
             LOG.critical(msg=_("Exception while obtaining "
-                               "all backups at %s class"
+                               "backups at %s class"
                                % repr(IndexView.__class__)))
         return backups
-        # Gather all the instances for these backups
+
+
+class RowsView(BatchRowUpdateView):
+    table_class = BackupsTable
+
+    def get_rows_data(self, ids):
+        results = api.fanout.fanout(
+            self.request, [(api.trove.backup_get, (backup_id,))
+                           for backup_id in ids])
+        backups = [result.value for result in results if result.ok]
+        deleted = [backup_id for backup_id in ids
+                   if api.trove.is_not_found(self.request, 'backup',
+                                             backup_id)]
+        instances = _fetch_instances(self.request, backups)
+        for backup in backups:
+            backup.instance = instances.get(backup.instance_id,
+                                            _('Not Found'))
+        return backups, deleted
 
 
 class BackupView(workflows.WorkflowView):
     workflow_class = CreateBackup
     template_name = "project/database_backups/backup.html"
 
+    def get_initial(self):
+        initial = super(BackupView, self).get_initial()
+        initial['instance'] = self.request.GET.get('instance')
+        return initial
+
     def get_context_data(self, **kwargs):
         context = super(BackupView, self).get_context_data(**kwargs)
         context["instance_id"] = kwargs.get("instance_id")
@@ -84,13 +182,70 @@ class BackupView(workflows.WorkflowView):
         return context
 
 
+class BackupSearchView(SearchView):
+    kind = 'backups'
+
+    def get_label(self, info):
+        label = super(BackupSearchView, self).get_label(info)
+        if info.get('created'):
+            label = "%s (%s)" % (label, info['created'])
+        return label
+
+
+class BulkBackupView(workflows.WorkflowView):
+    workflow_class = CreateBackups
+    template_name = "project/database_backups/backup.html"
+
+    def get_initial(self):
+        initial = super(BulkBackupView, self).get_initial()
+        initial['instances'] = jobs.get_selection(self.request,
+                                                  self.kwargs['selection'])
+        return initial
+
+
 def parse_date(date_string):
     import datetime
     return datetime.datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%S')
 
 
-class DetailView(APIView):
+class BackupsExportView(ExportView):
+    filename = 'backups'
+    columns = (('id', _('ID')), ('name', _('Name')),
+               ('status', _('Status')), ('instance_id', _('Instance ID')),
+               ('instance', _('Instance Name')),
+               ('location', _('Backup File')), ('created', _('Created')),
+               ('duration', _('Duration (s)')))
+
+    def _duration(self, backup):
+        try:
+            delta = (parse_date(backup.updated)
+                     - parse_date(backup.created))
+        except (AttributeError, TypeError, ValueError):
+            return None
+        return delta.days * 86400 + delta.seconds
+
+    def get_rows(self, request):
+        # Names only, the backups themselves are streamed page by page.
+        try:
+            infos, fetched_at = api.trove.cached_all(request, 'instances')
+            names = dict((info['id'], info['name']) for info in infos)
+        except:
+            LOG.exception("Unable to retrieve instances for the export")
+            names = {}
+        for backup in api.trove.backup_list_all(request, keep=False):
+            yield {'id': backup.id,
+                   'name': backup.name,
+                   'status': backup.status,
+                   'instance_id': backup.instance_id,
+                   'instance': names.get(backup.instance_id),
+                   'location': getattr(backup, 'locationRef', None),
+                   'created': getattr(backup, 'created', None),
+                   'duration': self._duration(backup)}
+
+
+class DetailView(api.budget.ApiBudgetMixin, APIView):
     template_name = "project/database_backups/details.html"
+    api_budget = api.budget.CallBudget(total=2)
 
     def get_data(self, request, context, *args, **kwargs):
         backup_id = kwargs.get("backup_id")
@@ -1,3 +1,5 @@
 from .create_backup import CreateBackup
+from .create_backup import CreateBackups
 
 assert CreateBackup
+assert CreateBackups
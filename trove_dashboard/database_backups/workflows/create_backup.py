@@ -16,6 +16,7 @@
 
 import logging
 
+from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 
 from horizon import exceptions
@@ -23,13 +24,17 @@ from horizon import forms
 from horizon import workflows
 
 from trove_dashboard import api
+from trove_dashboard import jobs
+from trove_dashboard.widgets import SearchSelect
 
 LOG = logging.getLogger(__name__)
 
 
 class BackupDetailsAction(workflows.Action):
     name = forms.CharField(max_length=80, label=_("Name"))
-    instance = forms.ChoiceField(label=_("Database Instance"))
+    instance = forms.CharField(
+        label=_("Database Instance"),
+        widget=SearchSelect("horizon:project:databases:search"))
     description = forms.CharField(max_length=512, label=_("Description"),
                                   widget=forms.TextInput(),
                                   required=False,
@@ -40,10 +45,36 @@ class BackupDetailsAction(workflows.Action):
         help_text_template = \
             "project/database_backups/_backup_details_help.html"
 
-    def populate_instance_choices(self, request, context):
-        LOG.info("Obtaining list of instances with limit 100 per page")
-        instances = api.trove.instance_list(request, limit=100)
-        return [(i.id, i.name) for i in instances]
+    def __init__(self, request, context, *args, **kwargs):
+        super(BackupDetailsAction, self).__init__(request, context, *args,
+                                                  **kwargs)
+        instance_id = self.initial.get('instance')
+        if instance_id:
+            instance = self._get_instance(instance_id)
+            if instance is not None:
+                self.fields['instance'].widget.label = instance['name']
+
+    def _get_instance(self, instance_id):
+        try:
+            index = api.trove.search_index(self.request, 'instances')
+            instance = index.get(instance_id)
+        except:
+            LOG.exception("Exception while obtaining instances")
+            instance = None
+        if instance is None:
+            # The index may predate the instance, ask Trove.
+            try:
+                instance = api.trove.instance_get(self.request,
+                                                  instance_id)._info
+            except:
+                LOG.exception("Exception while obtaining instance")
+        return instance
+
+    def clean_instance(self):
+        instance_id = self.cleaned_data['instance']
+        if self._get_instance(instance_id) is None:
+            raise forms.ValidationError(_("Unable to find instance!"))
+        return instance_id
 
 
 class SetBackupDetails(workflows.Step):
@@ -80,3 +111,88 @@ class CreateBackup(workflows.Workflow):
             LOG.exception("Exception while creating backup")
             exceptions.handle(request)
             return False
+
+
+class BulkBackupDetailsAction(workflows.Action):
+    name = forms.CharField(max_length=60, label=_("Name"),
+                           help_text=_("Every backup is named after its "
+                                       "instance with this suffix"))
+    instances = forms.MultipleChoiceField(
+        label=_("Database Instances"),
+        widget=forms.CheckboxSelectMultiple())
+    description = forms.CharField(max_length=512, label=_("Description"),
+                                  widget=forms.TextInput(),
+                                  required=False,
+                                  help_text=_("Optional Backup Description"))
+
+    class Meta:
+        name = _("Details")
+        help_text_template = \
+            "project/database_backups/_backup_details_help.html"
+
+    def populate_instances_choices(self, request, context):
+        # Only the instances picked in the table, not every one of the
+        # project.
+        selected = context.get('instances') or []
+        names = {}
+        try:
+            index = api.trove.search_index(request, 'instances')
+            for instance_id in selected:
+                info = index.get(instance_id)
+                if info is not None:
+                    names[instance_id] = info['name']
+        except:
+            exceptions.handle(request,
+                              _('Unable to retrieve instance names.'))
+        return sorted(((instance_id, names.get(instance_id, instance_id))
+                       for instance_id in selected),
+                      key=lambda choice: choice[1].lower())
+
+
+class SetBulkBackupDetails(workflows.Step):
+    action_class = BulkBackupDetailsAction
+    contributes = ["name", "description", "instances"]
+
+
+class CreateBackups(workflows.Workflow):
+    slug = "create_backups"
+    name = _("Backup Databases")
+    finalize_button_name = _("Backup")
+    success_message = _('Scheduled backups of %(count)s instances.')
+    failure_message = _('Unable to schedule backups of %(count)s '
+                        'instances.')
+    success_url = "horizon:project:database_backups:index"
+    default_steps = [SetBulkBackupDetails]
+
+    def format_status_message(self, message):
+        return message % {"count": len(self.context.get('instances', []))}
+
+    def get_success_url(self):
+        url = reverse(self.success_url)
+        if getattr(self, 'job_id', None):
+            url += "?job=%s" % self.job_id
+        return url
+
+    def handle(self, request, context):
+        names = dict(self.steps[0].action.fields['instances'].choices)
+        name = context['name']
+        description = context['description']
+
+        def create(request, instance_id):
+            backup_name = "%s-%s" % (names.get(instance_id, instance_id),
+                                     name)
+            api.trove.backup_create(request, backup_name, instance_id,
+                                    description)
+
+        try:
+            job = jobs.BulkJob('backup',
+                               [(instance_id, names.get(instance_id,
+                                                        instance_id))
+                                for instance_id in context['instances']],
+                               create)
+            self.job_id = job.start(request)
+            return True
+        except:
+            LOG.exception("Exception while scheduling backups")
+            exceptions.handle(request)
+            return False
@@ -16,6 +16,7 @@
 
 import logging
 
+from django import shortcuts
 from django.core import urlresolvers
 from django.template.defaultfilters import title
 from django.utils.translation import ugettext_lazy as _
@@ -24,7 +25,13 @@ from horizon import tables
 from horizon.templatetags import sizeformat
 from horizon.utils.filters import replace_underscores
 
+from troveclient import users as trove_users
+
 from trove_dashboard import api
+from trove_dashboard import jobs
+from trove_dashboard.actions import ConcurrentBatchAction
+from trove_dashboard.actions import ExportLink
+from trove_dashboard.tables import QueryPaginationMixin
 from ..database_backups.tables import LaunchLink as LaunchBackup
 from ..database_backups.tables import DeleteBackup
 from ..database_backups.tables import RestoreLink
@@ -53,7 +60,7 @@ SUSPEND = 0
 RESUME = 1
 
 
-class TerminateInstance(tables.BatchAction):
+class TerminateInstance(ConcurrentBatchAction):
     name = "terminate"
     action_present = _("Terminate")
     action_past = _("Scheduled termination of")
@@ -68,7 +75,7 @@ class TerminateInstance(tables.BatchAction):
         api.trove.instance_delete(request, obj_id)
 
 
-class RestartInstance(tables.BatchAction):
+class RestartInstance(ConcurrentBatchAction):
     name = "restart"
     action_present = _("Restart")
     action_past = _("Restarted")
@@ -132,6 +139,22 @@ class CreateBackup(tables.LinkAction):
         return url + "?instance=%s" % datam.id
 
 
+class CreateBackups(tables.Action):
+    name = "backups"
+    verbose_name = _("Backup Instances")
+    classes = ("btn-camera",)
+    handles_multiple = True
+
+    def allowed(self, request, instance=None):
+        return request.user.has_perm('openstack.services.object-store')
+
+    def multiple(self, data_table, request, object_ids):
+        # Hundreds of ids do not fit in a url, pass a token naming them.
+        return shortcuts.redirect(urlresolvers.reverse(
+            "horizon:project:database_backups:create_many",
+            args=(jobs.save_selection(request, object_ids),)))
+
+
 class UpdateRow(tables.Row):
     ajax = True
 
@@ -142,6 +165,33 @@ class UpdateRow(tables.Row):
         return instance
 
 
+# The users of an instance as the users tab listed them, so every row still
+# loading its access does not list all the users again.
+listed_users = api.cache.TTLCache(maxsize=1000, ttl=300)
+
+
+def listed_users_key(request, instance_id):
+    return (request.user.tenant_id, instance_id)
+
+
+class UpdateUserRow(tables.Row):
+    ajax = True
+
+    def get_data(self, request, user_name):
+        instance = self.table.kwargs['instance']
+        infos = listed_users.get(listed_users_key(request, instance.id))
+        if infos and user_name in infos:
+            user = trove_users.User(None, infos[user_name], loaded=True)
+        else:
+            users = api.trove.users_list(request, instance.id)
+            user = [u for u in users if u.name == user_name][0]
+        user.instance = instance
+        user.access = api.trove.user_list_access(request, instance.id,
+                                                 user_name)
+        user.access_status = 'loaded'
+        return user
+
+
 def get_ips(instance):
     if hasattr(instance, "ip"):
         if len(instance.ip):
@@ -162,8 +212,14 @@ def get_databases(user):
         databases = [db.name for db in user.access]
         databases.sort()
         return ', '.join(databases)
+    if get_access_status(user) == 'pending':
+        return _("Loading...")
     return _("-")
 
+
+def get_access_status(user):
+    return getattr(user, "access_status", "loaded")
+
 STATUS_DISPLAY_CHOICES = (
     ("resize", "Resize/Migrate"),
     ("verify_resize", "Confirm or Revert Resize/Migrate"),
@@ -171,7 +227,11 @@ STATUS_DISPLAY_CHOICES = (
 )
 
 
-class InstancesTable(tables.DataTable):
+class ExportInstances(ExportLink):
+    url = "horizon:project:databases:export"
+
+
+class InstancesTable(QueryPaginationMixin, tables.DataTable):
     STATUS_CHOICES = (
         ("active", True),
         ("shutoff", True),
@@ -198,20 +258,32 @@ class InstancesTable(tables.DataTable):
         verbose_name = _("Databases")
         status_columns = ["status"]
         row_class = UpdateRow
-        table_actions = (LaunchLink, TerminateInstance)
+        table_actions = (LaunchLink, CreateBackups, ExportInstances,
+                         TerminateInstance)
         row_actions = (CreateBackup,
                        RestartInstance, TerminateInstance)
 
 
 class UsersTable(tables.DataTable):
+    ACCESS_STATUS_CHOICES = (
+        ("loaded", True),
+        ("failed", False),
+        ("pending", None),
+    )
     name = tables.Column("name", verbose_name=_("User Name"))
     host = tables.Column("host", verbose_name=_("Allowed Hosts"))
     databases = tables.Column(get_databases,
                               verbose_name=_("Databases"))
+    access_status = tables.Column(get_access_status,
+                                  hidden=True,
+                                  status=True,
+                                  status_choices=ACCESS_STATUS_CHOICES)
 
     class Meta:
         name = "users"
         verbose_name = _("Database Instance Users")
+        status_columns = ["access_status"]
+        row_class = UpdateUserRow
         table_actions = [DeleteUser]
         row_actions = [DeleteUser]
 
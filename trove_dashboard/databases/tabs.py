@@ -14,17 +14,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import logging
+import time
+
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
 from horizon import tabs
 
 from trove_dashboard import api
+from . import tables
 from .tables import UsersTable
 from .tables import DatabaseTable
 from .tables import InstanceBackupsTable
 
 
+LOG = logging.getLogger(__name__)
+
+# Concurrent user_list_access lookups and how long the tab waits for them,
+# users still missing afterwards load their access through a row update.
+USERS_ACCESS_WORKERS = getattr(settings, 'TROVE_USERS_ACCESS_WORKERS', 5)
+USERS_ACCESS_TIMEOUT = getattr(settings, 'TROVE_USERS_ACCESS_TIMEOUT', 5)
+USERS_TAB_BUDGET = getattr(settings, 'TROVE_USERS_TAB_BUDGET', 5)
+
+
 class OverviewTab(tabs.Tab):
     name = _("Overview")
     slug = "overview"
@@ -44,15 +57,39 @@ class UserTab(tabs.TableTab):
 
     def get_users_data(self):
         instance = self.tab_group.kwargs['instance']
+        start = time.time()
+        calls = 1
         try:
             data = api.trove.users_list(self.request, instance.id)
-            for user in data:
+            calls += len(data)
+            access = api.fanout.fanout(
+                self.request, [(api.trove.user_list_access,
+                                (instance.id, user.name))
+                               for user in data],
+                timeout=USERS_ACCESS_TIMEOUT,
+                concurrency=USERS_ACCESS_WORKERS)
+            for user, result in zip(data, access):
                 user.instance = instance
-                user.access = api.trove.user_list_access(self.request,
-                                                         instance.id,
-                                                         user.name)
+                if result.ok:
+                    user.access = result.value
+                    user.access_status = 'loaded'
+                elif isinstance(result.exception, api.fanout.FanoutTimeout):
+                    user.access_status = 'pending'
+                else:
+                    user.access_status = 'failed'
+            if any(user.access_status == 'pending' for user in data):
+                tables.listed_users.set(
+                    tables.listed_users_key(self.request, instance.id),
+                    dict((user.name, user._info) for user in data))
         except:
             data = []
+        elapsed = time.time() - start
+        LOG.info("Users tab of instance %s made %s API calls in %.3fs",
+                 instance.id, calls, elapsed)
+        if elapsed > USERS_TAB_BUDGET:
+            LOG.warning("Users tab of instance %s took %.3fs, over the "
+                        "budget of %ss", instance.id, elapsed,
+                        USERS_TAB_BUDGET)
         return data
 
     def allowed(self, request):
@@ -0,0 +1,45 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from trove_dashboard import api
+from trove_dashboard.api import metrics
+from trove_dashboard.test import helpers
+
+from . import views
+
+
+class IndexViewTests(helpers.FakeTroveTestCase):
+
+    def test_index_within_budget(self):
+        request, response = self.render(views.IndexView)
+        self.assertEqual(response.status_code, 200)
+        timings = metrics.get_request_timings(request)
+        self.assertEqual(timings.count('instance_list'), 1)
+        self.assertEqual(timings.count('flavor_get'), 0)
+
+    def test_filtered_index_within_budget(self):
+        request, response = self.render(views.IndexView,
+                                        {'status': 'ACTIVE',
+                                         'sort': 'name'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_over_budget_fails(self):
+        class TightIndexView(views.IndexView):
+            api_budget = api.budget.CallBudget(total=0)
+
+        self.assertRaises(api.budget.BudgetExceeded, self.render,
+                          TightIndexView)
@@ -16,12 +16,22 @@
 
 from django.conf.urls.defaults import patterns, url
 
-from .views import IndexView, DetailView, LaunchInstanceView
+from .views import IndexView, DetailView, LaunchInstanceView, RowsView, \
+    InstanceSearchView, InstancesExportView, UsersExportView, \
+    DatabasesExportView
 
 
 urlpatterns = patterns(
     '',
     url(r'^$', IndexView.as_view(), name='index'),
     url(r'^launch$', LaunchInstanceView.as_view(), name='launch'),
+    url(r'^rows$', RowsView.as_view(), name='rows'),
+    url(r'^search$', InstanceSearchView.as_view(), name='search'),
+    url(r'^export\.(?P<format>csv|json)$', InstancesExportView.as_view(),
+        name='export'),
+    url(r'^(?P<instance_id>[^/]+)/users\.(?P<format>csv|json)$',
+        UsersExportView.as_view(), name='export_users'),
+    url(r'^(?P<instance_id>[^/]+)/databases\.(?P<format>csv|json)$',
+        DatabasesExportView.as_view(), name='export_databases'),
     url(r'^(?P<instance_id>[^/]+)/$', DetailView.as_view(), name='detail'),
 )
@@ -19,16 +19,24 @@ Views for managing instances.
 """
 import logging
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
-from django.utils.datastructures import SortedDict
 from django.utils.translation import ugettext_lazy as _
 
 from horizon import exceptions
+from horizon import messages
 from horizon import tabs
 from horizon import tables
 from horizon import workflows
 
 from trove_dashboard import api
+from trove_dashboard import rows
+from trove_dashboard.tables import filter_fields
+from trove_dashboard.tables import sort_choices
+from trove_dashboard.views import BatchRowUpdateView
+from trove_dashboard.views import data_age
+from trove_dashboard.views import ExportView
+from trove_dashboard.views import SearchView
 from .tabs import InstanceDetailTabs
 from .tables import InstancesTable
 from .workflows import LaunchInstance
@@ -36,23 +44,96 @@ from .workflows import LaunchInstance
 
 LOG = logging.getLogger(__name__)
 
+PAGE_SIZE = getattr(settings, 'TROVE_INSTANCE_PAGE_SIZE',
+                    getattr(settings, 'API_RESULT_PAGE_SIZE', 20))
 
-class IndexView(tables.DataTableView):
+INSTANCE_STATUSES = [(status, status) for status in
+                     ('ACTIVE', 'BUILD', 'REBOOT', 'RESIZE', 'SHUTDOWN',
+                      'ERROR', 'FAILED')]
+
+
+def resolve_flavors(request, instances, flavors):
+    """Set ``full_flavor`` on every instance whose flavor can be found.
+
+    Flavors missing from ``flavors``, typically retired ones, are fetched
+    once each and concurrently. Returns the ids of those that failed.
+    """
+    full_flavors = dict((str(flavor.id), flavor) for flavor in flavors)
+    missing = sorted(set(str(instance.flavor['id'])
+                         for instance in instances)
+                     - set(full_flavors))
+    results = api.fanout.fanout(request, [(api.trove.flavor_get, (flavor_id,))
+                                          for flavor_id in missing])
+    failed = []
+    for flavor_id, result in zip(missing, results):
+        if result.ok:
+            full_flavors[flavor_id] = result.value
+        else:
+            failed.append(flavor_id)
+    for instance in instances:
+        flavor = full_flavors.get(str(instance.flavor['id']))
+        if flavor is not None:
+            instance.full_flavor = flavor
+    return failed
+
+
+class IndexView(api.budget.ApiBudgetMixin, tables.DataTableView):
     table_class = InstancesTable
     template_name = 'project/databases/index.html'
+    # One flavor_get per distinct unknown flavor of the page.
+    api_budget = api.budget.CallBudget(total=6, instance_list=1,
+                                       flavor_list=1, flavor_get=4)
+    # Filtering walks every page of the instance list on a cache miss.
+    filtered_budget = api.budget.CallBudget(flavor_list=1, flavor_get=4)
 
     def has_more_data(self, table):
         return self._more
 
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['data_age'] = data_age(getattr(self, '_fetched_at', None))
+        try:
+            flavors = [(str(flavor.id), flavor.name) for flavor in
+                       api.trove.flavor_list(self.request)]
+        except:
+            LOG.exception("Unable to retrieve flavors for the filters")
+            flavors = []
+        context['filters'] = filter_fields(
+            self.request, [('q', _('Name'), None),
+                           ('status', _('Status'), INSTANCE_STATUSES),
+                           ('flavor', _('Flavor'), sorted(flavors)),
+                           ('created_after', _('Created after'), 'date'),
+                           ('created_before', _('Created before'), 'date')])
+        context['sort_choices'] = sort_choices([('name', _('Name')),
+                                                ('status', _('Status')),
+                                                ('created', _('Created'))])
+        context['sort'] = self.request.GET.get('sort', '')
+        context['filtered'] = bool(api.search.Query(self.request.GET))
+        return context
+
     def get_data(self):
         marker = self.request.GET. \
             get(InstancesTable._meta.pagination_param, None)
-        # Gather our instances
+        # Gather our instances and flavors at the same time
+        query = api.search.Query(self.request.GET)
+        if query:
+            self.api_budget = self.filtered_budget
+            list_call = (api.trove.query_list, ('instances', query),
+                         {'limit': PAGE_SIZE, 'marker': marker})
+        elif api.trove.LIST_CACHE and marker is None:
+            list_call = (api.trove.cached_list, ('instances',),
+                         {'limit': PAGE_SIZE})
+        else:
+            list_call = (api.trove.instance_list, (),
+                         {'limit': PAGE_SIZE, 'marker': marker})
+        instances, flavors = api.fanout.fanout(
+            self.request, [list_call, (api.trove.flavor_list, ())])
         try:
-            instances = api.trove.instance_list(self.request, marker=marker)
+            instances = instances.get()
             LOG.info(msg=_("Obtaining instances at %s class"
                            % repr(IndexView.__class__)))
-            self._more = False
+            self._more = bool(getattr(instances, 'next', None))
+            self._fetched_at = getattr(instances, 'fetched_at', None)
         except:
             self._more = False
             instances = []
@@ -60,10 +141,10 @@ class IndexView(tables.DataTableView):
                          "Unable to retrieve instances.")
             return instances
             #exceptions.handle(self.request, ignore=True)
-            # Gather our flavors and correlate our instances to them
+            # Correlate the instances of this page to the flavors
         if instances:
             try:
-                flavors = api.trove.flavor_list(self.request)
+                flavors = flavors.get()
                 LOG.info(msg=_("Obtaining flavor list from nova at %s class"
                                % repr(IndexView.__class__)))
             except:
@@ -73,25 +154,114 @@ class IndexView(tables.DataTableView):
                                    % repr(IndexView.__class__)))
                 exceptions.handle(self.request, ignore=True)
 
-            full_flavors = SortedDict([(str(flavor.id), flavor)
-                                       for flavor in flavors])
-            # Loop through instances to get flavor info.
-            for instance in instances:
-                try:
-                    flavor_id = instance.flavor["id"]
-                    if flavor_id in full_flavors:
-                        instance.full_flavor = full_flavors[flavor_id]
-                    else:
-                        # If the flavor_id is not in full_flavors list,
-                        # get it via nova api.trove.
-                        instance.full_flavor = api.trove.flavor_get(
-                            self.request, flavor_id)
-                except:
-                    msg = _('Unable to retrieve instance size information')
-                    LOG.critical(msg + _(" at %s class"
-                                         % repr(IndexView.__class__)))
-                    exceptions.handle(self.request, msg)
-        return instances
+            failed = resolve_flavors(self.request, instances, flavors)
+            if failed:
+                LOG.warning("Unable to retrieve flavors %s of the instances "
+                            "index", ', '.join(failed))
+                messages.warning(self.request,
+                                 _('Unable to retrieve instance size '
+                                   'information'))
+        return rows.instance_rows(instances)
+
+
+class RowsView(BatchRowUpdateView):
+    table_class = InstancesTable
+
+    def get_rows_data(self, ids):
+        results = api.fanout.fanout(
+            self.request, [(api.trove.instance_get, (instance_id,))
+                           for instance_id in ids])
+        instances = [result.value for result in results if result.ok]
+        deleted = [instance_id for instance_id in ids
+                   if api.trove.is_not_found(self.request, 'instance',
+                                             instance_id)]
+        try:
+            flavors = api.trove.flavor_list(self.request)
+        except:
+            LOG.exception("Unable to retrieve flavors")
+            flavors = []
+        failed = resolve_flavors(self.request, instances, flavors)
+        if failed:
+            LOG.warning("Unable to retrieve flavors %s", ', '.join(failed))
+        return instances, deleted
+
+
+class InstanceSearchView(SearchView):
+    kind = 'instances'
+
+    def get_label(self, info):
+        label = super(InstanceSearchView, self).get_label(info)
+        if info.get('status'):
+            label = "%s (%s)" % (label, info['status'])
+        return label
+
+
+class InstancesExportView(ExportView):
+    filename = 'instances'
+    columns = (('id', _('ID')), ('name', _('Name')),
+               ('status', _('Status')), ('flavor', _('Flavor')),
+               ('ram', _('RAM (MB)')), ('volume', _('Volume Size (GB)')),
+               ('ip', _('IP Address')), ('created', _('Created')))
+
+    def _flavor(self, request, flavors, flavor_id):
+        if flavor_id not in flavors:
+            try:
+                flavors[flavor_id] = api.trove.flavor_get(request, flavor_id)
+            except:
+                LOG.warning("Unable to retrieve flavor %s", flavor_id)
+                flavors[flavor_id] = None
+        return flavors[flavor_id]
+
+    def get_rows(self, request):
+        try:
+            flavors = dict((str(flavor.id), flavor) for flavor in
+                           api.trove.flavor_list(request))
+        except:
+            LOG.exception("Unable to retrieve flavors for the export")
+            flavors = {}
+        for instance in api.trove.instance_list_all(request, keep=False):
+            flavor = self._flavor(request, flavors,
+                                  str(instance.flavor['id']))
+            yield {'id': instance.id,
+                   'name': instance.name,
+                   'status': instance.status,
+                   'flavor': getattr(flavor, 'name', None),
+                   'ram': getattr(flavor, 'ram', None),
+                   'volume': (getattr(instance, 'volume', None)
+                              or {}).get('size'),
+                   'ip': ', '.join(getattr(instance, 'ip', None) or []),
+                   'created': getattr(instance, 'created', None)}
+
+
+class UsersExportView(ExportView):
+    columns = (('name', _('User Name')), ('host', _('Allowed Hosts')),
+               ('databases', _('Databases')))
+
+    def get_filename(self, request, instance_id):
+        return 'users-%s' % instance_id
+
+    def get_rows(self, request, instance_id):
+        for user in api.trove.users_list(request, instance_id):
+            yield {'name': user.name,
+                   'host': getattr(user, 'host', None),
+                   'databases': ', '.join(db['name'] for db in
+                                          getattr(user, 'databases', []))}
+
+
+class DatabasesExportView(ExportView):
+    columns = (('name', _('Database Name')),
+               ('character_set', _('Character Set')),
+               ('collate', _('Collation')))
+
+    def get_filename(self, request, instance_id):
+        return 'databases-%s' % instance_id
+
+    def get_rows(self, request, instance_id):
+        for database in api.trove.database_list(request, instance_id):
+            yield {'name': database.name,
+                   'character_set': getattr(database, 'character_set',
+                                            None),
+                   'collate': getattr(database, 'collate', None)}
 
 
 class LaunchInstanceView(workflows.WorkflowView):
@@ -105,9 +275,14 @@ class LaunchInstanceView(workflows.WorkflowView):
         return initial
 
 
-class DetailView(tabs.TabbedTableView):
+class DetailView(api.budget.ApiBudgetMixin, tabs.TabbedTableView):
     tab_group_class = InstanceDetailTabs
     template_name = 'project/databases/detail.html'
+    # The users tab needs one user_list_access per user, there is no
+    # bulk call for it.
+    api_budget = api.budget.CallBudget(instance_get=1, flavor_get=1,
+                                       users_list=1, database_list=1,
+                                       instance_backups=1)
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
@@ -118,7 +293,11 @@ class DetailView(tabs.TabbedTableView):
         if not hasattr(self, "_instance"):
             try:
                 instance_id = self.kwargs['instance_id']
-                instance = api.trove.instance_get(self.request, instance_id)
+                # Warm the flavor cache while the instance is fetched.
+                instance, flavors = api.fanout.fanout(
+                    self.request, [(api.trove.instance_get, (instance_id,)),
+                                   (api.trove.flavor_list, ())])
+                instance = instance.get()
                 LOG.info(msg=_("Obtaining instance for detailed view "
                                "at %s class" % repr(DetailView.__class__)))
                 instance.full_flavor = api.trove.flavor_get(
@@ -21,13 +21,87 @@ from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
 from horizon import exceptions
 from horizon import forms
+from horizon import messages
 from horizon import workflows
 
+from trove_dashboard import actions
 from trove_dashboard import api
+from trove_dashboard.widgets import SearchSelect
 
 
 LOG = logging.getLogger(__name__)
 
+MAX_COUNT = getattr(settings, 'TROVE_LAUNCH_MAX_COUNT', 50)
+LAUNCH_CONCURRENCY = getattr(settings, 'TROVE_LAUNCH_CONCURRENCY', 5)
+
+
+# Flavors and quota of a project shown by the launch workflow.
+launch_cache = api.cache.SharedCache(
+    'trove_dashboard:launch',
+    maxsize=getattr(settings, 'TROVE_LAUNCH_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'TROVE_LAUNCH_CACHE_TTL', 30),
+    backend=getattr(settings, 'TROVE_LAUNCH_CACHE_BACKEND', None))
+
+
+def _launch_key(request):
+    return (getattr(request.user, 'services_region', None),
+            request.user.tenant_id)
+
+
+def launch_data(request):
+    """Everything the launch workflow looks up, fetched together.
+
+    Flavors and absolute limits are loaded concurrently the first time
+    any step needs them and kept per project in ``launch_cache``, so
+    the steps and every redisplay of the form share one set of calls and
+    the JSON blobs of the help text are built once. Lookups that failed
+    are None and the result is then not cached.
+    """
+    data = getattr(request, '_trove_launch_data', None)
+    if data is not None:
+        return data
+    data = launch_cache.get(_launch_key(request))
+    if data is None:
+        results = api.fanout.fanout(
+            request, [(api.nova.flavor_list, ()),
+                      (api.nova.tenant_absolute_limits, ())])
+        data = {'flavors': None, 'flavors_json': None,
+                'usages': None, 'usages_json': None}
+        if results[0].ok:
+            flavors = results[0].value
+            data['flavors'] = [f._info for f in flavors]
+            data['flavors_json'] = json.dumps(data['flavors'])
+        if results[1].ok:
+            data['usages'] = results[1].value
+            data['usages_json'] = json.dumps(data['usages'])
+        for result in results:
+            if not result.ok:
+                LOG.warning("Launch workflow lookup failed: %s",
+                            result.exception)
+        if None not in data.values():
+            launch_cache.set(_launch_key(request), data)
+    request._trove_launch_data = data
+    return data
+
+
+def forget_launch_data(request):
+    launch_cache.delete(_launch_key(request))
+    request._trove_launch_data = None
+
+
+def instance_names(name, count):
+    """Names of ``count`` instances launched together.
+
+    ``{index}`` in ``name`` is replaced by the number of the instance,
+    starting at 1. Without it the number is appended to the name.
+    """
+    if count == 1:
+        return [name.replace('{index}', '1')]
+    if '{index}' not in name:
+        name += '-{index}'
+    return [name.replace('{index}', str(index))
+            for index in range(1, count + 1)]
+
 
 class SetInstanceDetailsAction(workflows.Action):
     name = forms.CharField(max_length=80, label=_("Database Name"))
@@ -37,37 +111,74 @@ class SetInstanceDetailsAction(workflows.Action):
                                 min_value=1,
                                 initial=1,
                                 help_text=_("Size of the volume in GB."))
+    count = forms.IntegerField(label=_("Instance Count"),
+                               min_value=1,
+                               max_value=MAX_COUNT,
+                               initial=1,
+                               help_text=_("Number of instances to launch. "
+                                           "{index} in the name is replaced "
+                                           "by the number of each."))
 
     class Meta:
         name = _("Details")
         help_text_template = ("project/instances/_launch_details_help.html")
 
     def populate_flavor_choices(self, request, context):
-        try:
-            LOG.debug("Obtaining flavors list")
-            flavors = api.nova.flavor_list(request)
-            flavor_list = [(flavor.id, "%s" % flavor.name)
-                           for flavor in flavors]
-        except:
-            LOG.exception("Exception while obtaining flavors list")
-            flavor_list = []
-            exceptions.handle(request,
-                              _('Unable to retrieve instance flavors.'))
-        return sorted(flavor_list)
+        flavors = launch_data(request)['flavors']
+        if flavors is None:
+            messages.error(request,
+                           _('Unable to retrieve instance flavors.'))
+            return []
+        return sorted((flavor['id'], "%s" % flavor['name'])
+                      for flavor in flavors)
+
+    def clean(self):
+        cleaned_data = super(SetInstanceDetailsAction, self).clean()
+        count = cleaned_data.get('count') or 1
+        if count == 1 or not cleaned_data.get('flavor'):
+            return cleaned_data
+        # One quota check for the whole batch instead of a failed create
+        # per instance above the quota.
+        data = launch_data(self.request)
+        usages = data['usages']
+        flavor = [f for f in data['flavors'] or []
+                  if str(f['id']) == str(cleaned_data['flavor'])]
+        if usages is None or not flavor:
+            LOG.warning("Unable to check the quota of %s instances", count)
+            return cleaned_data
+        errors = []
+        max_instances = usages.get('maxTotalInstances', 0)
+        # Nova reports an unlimited quota as -1.
+        if max_instances != -1:
+            available = max_instances - usages.get('totalInstancesUsed', 0)
+            if count > available:
+                msg = _('The quota allows %(available)s more instances, '
+                        '%(count)s requested.')
+                errors.append(msg % {'available': max(available, 0),
+                                     'count': count})
+        max_ram = usages.get('maxTotalRAMSize', 0)
+        if max_ram != -1:
+            ram = max_ram - usages.get('totalRAMUsed', 0)
+            needed = flavor[0]['ram'] * count
+            if needed > ram:
+                msg = _('The quota allows %(ram)s MB more RAM, %(count)s '
+                        'instances of this flavor need %(needed)s MB.')
+                errors.append(msg % {'ram': max(ram, 0), 'count': count,
+                                     'needed': needed})
+        if errors:
+            self._errors['count'] = self.error_class(errors)
+        return cleaned_data
 
     def get_help_text(self):
+        data = launch_data(self.request)
         extra = {}
-        try:
-            LOG.debug("Obtaining absolute tenant limits")
-            extra['usages'] = api.nova.tenant_absolute_limits(self.request)
-            extra['usages_json'] = json.dumps(extra['usages'])
-            flavors = json.dumps([f._info for f in
-                                  api.nova.flavor_list(self.request)])
-            extra['flavors'] = flavors
-        except:
-            LOG.exception("Error obtaining absolute tenant limits")
-            exceptions.handle(self.request,
-                              _("Unable to retrieve quota information."))
+        if data['usages'] is None or data['flavors'] is None:
+            messages.error(self.request,
+                           _("Unable to retrieve quota information."))
+        else:
+            extra['usages'] = data['usages']
+            extra['usages_json'] = data['usages_json']
+            extra['flavors'] = data['flavors_json']
         return super(SetInstanceDetailsAction, self).get_help_text(extra)
 
 
@@ -78,7 +189,7 @@ TROVE_ADD_PERMS = TROVE_ADD_USER_PERMS + TROVE_ADD_DATABASE_PERMS
 
 class SetInstanceDetails(workflows.Step):
     action_class = SetInstanceDetailsAction
-    contributes = ("name", "volume", "flavor")
+    contributes = ("name", "volume", "flavor", "count")
 
 
 class AddDatabasesAction(workflows.Action):
@@ -128,37 +239,36 @@ class InitializeDatabase(workflows.Step):
 
 
 class RestoreAction(workflows.Action):
-    backup = forms.ChoiceField(label=_("Backup"),
-                               required=False,
-                               help_text=_('Select a backup to Restore'))
+    backup = forms.CharField(
+        label=_("Backup"),
+        required=False,
+        widget=SearchSelect("horizon:project:database_backups:search"),
+        help_text=_('Search for a backup to Restore'))
 
     class Meta:
         name = _("Restore From Backup")
         permissions = ('openstack.services.object-store',)
         help_text_template = "project/databases/_launch_restore_help.html"
 
-    def populate_backup_choices(self, request, context):
-        empty = [('', '-')]
-        try:
-            backups = api.trove.backup_list(request)
-
-            backup_list = [(b.id, b.name) for b in backups]
-        except:
-            backup_list = []
-        return empty + backup_list
-
     def clean_backup(self):
         backup = self.cleaned_data['backup']
         if backup:
+            # Make sure the user is not "hacking" the form and that they
+            # have access to this backup_id, with the index the picker
+            # searched.
             try:
-                # Make sure the user is not "hacking" the form
-                # and that they have access to this backup_id
-                LOG.debug("Obtaining backups")
-                bkup = api.trove.backup_get(self.request, backup)
-                self.cleaned_data['backup'] = bkup.id
+                index = api.trove.search_index(self.request, 'backups')
+                found = index.get(backup) is not None
             except:
                 LOG.exception("Exception while obtaining backups")
-                raise forms.ValidationError(_("Unable to find backup!"))
+                found = False
+            if not found:
+                # The index may predate the backup, ask Trove.
+                try:
+                    api.trove.backup_get(self.request, backup)
+                except:
+                    LOG.exception("Exception while obtaining backup")
+                    raise forms.ValidationError(_("Unable to find backup!"))
         return backup
 
 
@@ -177,8 +287,13 @@ class LaunchInstance(workflows.Workflow):
     default_steps = (SetInstanceDetails, InitializeDatabase, RestoreBackup)
 
     def format_status_message(self, message):
-        name = self.context.get('name', 'unknown instance')
-        return message % {"count": _("instance"), "name": name}
+        names = (getattr(self, '_reported', None)
+                 or [self.context.get('name', 'unknown instance')])
+        if len(names) == 1:
+            count = _("instance")
+        else:
+            count = _("%s instances") % len(names)
+        return message % {"count": count, "name": '", "'.join(names)}
 
     def _get_databases(self, context):
         """Returns the initial databases for this instance."""
@@ -206,23 +321,65 @@ class LaunchInstance(workflows.Workflow):
             backup = {'backupRef': context['backup']}
         return backup
 
+    def _create(self, request, name, context):
+        return actions.limited(request, api.trove.instance_create,
+                               name,
+                               context['volume'],
+                               context['flavor'],
+                               databases=self._get_databases(context),
+                               users=self._get_users(context),
+                               restore_point=self._get_backup(context))
+
     def handle(self, request, context):
+        # The quota changes with the launch.
+        forget_launch_data(request)
+        names = instance_names(context['name'], context.get('count') or 1)
+        if len(names) > 1:
+            return self._handle_many(request, context, names)
         try:
             LOG.info("Launching instance with parameters "
                      "{name=%s, volume=%s, flavor=%s, dbs=%s, users=%s, "
                      "backups=%s}",
-                     context['name'], context['volume'], context['flavor'],
+                     names[0], context['volume'], context['flavor'],
                      self._get_databases(context), self._get_users(context),
                      self._get_backup(context))
             api.trove.instance_create(request,
-                                      context['name'],
+                                      names[0],
                                       context['volume'],
                                       context['flavor'],
                                       databases=self._get_databases(context),
                                       users=self._get_users(context),
                                       restore_point=self._get_backup(context))
+            self._reported = names
             return True
         except:
             LOG.exception("Exception while launching instance")
             exceptions.handle(request)
             return False
+
+    def _handle_many(self, request, context, names):
+        LOG.info("Launching %s instances with parameters "
+                 "{names=%s, volume=%s, flavor=%s, backups=%s}",
+                 len(names), names, context['volume'], context['flavor'],
+                 self._get_backup(context))
+        results = api.fanout.fanout(
+            request, [(self._create, (name, context)) for name in names],
+            timeout=actions.TIMEOUT, concurrency=LAUNCH_CONCURRENCY,
+            executor=actions.write_executor)
+        launched = []
+        failed = []
+        for name, result in zip(names, results):
+            if result.ok:
+                launched.append(name)
+                continue
+            LOG.warning("Unable to launch instance %s: %s", name,
+                        result.exception)
+            failed.append(name)
+            messages.error(request,
+                           _('Unable to launch instance "%(name)s": '
+                             '%(error)s') % {'name': name,
+                                             'error': result.exception})
+        # The workflow reports the launched instances, or all of them as
+        # failed when none was.
+        self._reported = launched or failed
+        return bool(launched)
@@ -0,0 +1,172 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Bulk jobs of the database panels.
+
+A ``BulkJob`` submits one API call per item from a few background threads
+of the worker process, so the form that started it returns at once. Its
+progress is kept in a ``SharedCache`` and served as a whole by
+``views.JobProgressView``, the page polls that instead of every item.
+"""
+import logging
+import Queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.encoding import force_unicode
+
+from trove_dashboard import actions
+from trove_dashboard import api
+
+
+LOG = logging.getLogger(__name__)
+
+CONCURRENCY = getattr(settings, 'TROVE_BULK_CONCURRENCY', 5)
+TIMEOUT = getattr(settings, 'TROVE_BULK_TIMEOUT', 3600)
+
+progress = api.cache.SharedCache(
+    'trove_dashboard:jobs',
+    maxsize=getattr(settings, 'TROVE_BULK_JOB_CACHE_SIZE', 100),
+    ttl=getattr(settings, 'TROVE_BULK_JOB_TTL', 3600),
+    backend=getattr(settings, 'TROVE_BULK_JOB_BACKEND', None))
+
+# Rows picked in a table for a bulk job, too many to pass in a url.
+selections = api.cache.SharedCache(
+    'trove_dashboard:selections',
+    maxsize=getattr(settings, 'TROVE_BULK_JOB_CACHE_SIZE', 100),
+    ttl=getattr(settings, 'TROVE_BULK_JOB_TTL', 3600),
+    backend=getattr(settings, 'TROVE_BULK_JOB_BACKEND', None))
+
+
+def save_selection(request, ids):
+    """Keep the ``ids`` picked for a bulk job, return their token."""
+    token = uuid.uuid4().hex
+    selections.set((token,), (request.user.tenant_id, list(ids)))
+    return token
+
+
+def get_selection(request, token):
+    """The ids saved under ``token`` for the project, [] if unknown."""
+    entry = selections.get((token,), fresh=True)
+    if entry is None or entry[0] != request.user.tenant_id:
+        return []
+    return entry[1]
+
+
+class BulkJob(object):
+    """Call ``func(request, key)`` for every ``(key, label)`` of ``items``.
+
+    At most ``concurrency`` calls run at the same time and each one waits
+    for a slot of the per project write rate limit. Items not started
+    ``timeout`` seconds after the job are reported as failed. Results are
+    kept by ``key``, labels need not be unique.
+    """
+
+    def __init__(self, kind, items, func, concurrency=None, timeout=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.items = list(items)
+        self.func = func
+        self.concurrency = concurrency or CONCURRENCY
+        self.timeout = timeout or TIMEOUT
+        self.succeeded = []
+        self.failed = {}
+        self.finished = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return {'id': self.id,
+                    'kind': self.kind,
+                    'total': len(self.items),
+                    'succeeded': list(self.succeeded),
+                    'failed': dict(self.failed),
+                    'pending': (len(self.items) - len(self.succeeded)
+                                - len(self.failed)),
+                    'finished': self.finished}
+
+    def _save(self):
+        # Keep a slower thread from overwriting a newer snapshot.
+        with self._save_lock:
+            progress.set((self.id,), (self.tenant_id, self.snapshot()))
+
+    def _record(self, key, label, error=None):
+        with self._lock:
+            if error is None:
+                self.succeeded.append(key)
+            else:
+                self.failed[key] = {'label': label, 'error': error}
+        self._save()
+
+    def _worker(self, request, queue, deadline):
+        while True:
+            try:
+                key, label = queue.get_nowait()
+            except Queue.Empty:
+                return
+            if time.time() >= deadline:
+                self._record(key, label,
+                             "Not started within %ss" % self.timeout)
+                continue
+            try:
+                actions.limited(request, self.func, key)
+            except Exception as e:
+                LOG.warning("Bulk %s of %s failed: %s", self.kind, label, e)
+                self._record(key, label, force_unicode(e))
+            else:
+                self._record(key, label)
+
+    def _run(self, request):
+        start = time.time()
+        queue = Queue.Queue()
+        for item in self.items:
+            queue.put(item)
+        threads = [threading.Thread(target=self._worker,
+                                    args=(request, queue,
+                                          start + self.timeout))
+                   for i in range(min(self.concurrency, len(self.items)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self.finished = True
+        self._save()
+        LOG.info("Bulk %s %s: %d succeeded, %d failed in %.2fs", self.kind,
+                 self.id, len(self.succeeded), len(self.failed),
+                 time.time() - start)
+
+    def start(self, request):
+        """Start the job in the background and return its id."""
+        self.tenant_id = request.user.tenant_id
+        self._save()
+        thread = threading.Thread(target=self._run, args=(request,),
+                                  name="trove-bulk-%s" % self.id)
+        thread.daemon = True
+        thread.start()
+        return self.id
+
+
+def get_progress(request, job_id):
+    """The last ``snapshot`` of a job of the project, None if unknown."""
+    entry = progress.get((job_id,), fresh=True)
+    if entry is None or entry[0] != request.user.tenant_id:
+        return None
+    return entry[1]
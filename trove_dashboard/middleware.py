@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Middleware for the database panels.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+from trove_dashboard.api import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+PANEL_NAMESPACES = ('horizon:project:databases',
+                    'horizon:project:database_backups')
+
+
+class ServerTimingMiddleware(object):
+    """Add a ``Server-Timing`` header to the responses of the panels.
+
+    The header breaks the response time down into trove API time, number
+    of API calls, cache hits and template rendering, so a slow page can
+    be explained from the browser's developer tools. With
+    ``TROVE_SERVER_TIMING_DEBUG`` every API call is listed as well and the
+    summary is logged.
+
+    Add ``'trove_dashboard.middleware.ServerTimingMiddleware'`` to
+    ``MIDDLEWARE_CLASSES`` to enable it.
+    """
+
+    def __init__(self):
+        self.debug = getattr(settings, 'TROVE_SERVER_TIMING_DEBUG', False)
+
+    def process_request(self, request):
+        request._trove_start = time.time()
+        metrics.start_request_timings(request)
+
+    def process_template_response(self, request, response):
+        request._trove_render_start = time.time()
+        return response
+
+    def _is_panel(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match is not None and match.namespace in PANEL_NAMESPACES
+
+    def process_response(self, request, response):
+        timings = metrics.get_request_timings(request)
+        if timings is None or not self._is_panel(request):
+            return response
+        now = time.time()
+        total = now - request._trove_start
+        render = now - getattr(request, '_trove_render_start', now)
+        entries = ['trove-api;dur=%.1f;desc="Trove API"'
+                   % (timings.api_time * 1000),
+                   'trove-calls;desc="%d calls"' % len(timings.calls),
+                   'trove-cache;desc="%d cache hits"' % timings.cache_hits,
+                   'render;dur=%.1f;desc="Template"' % (render * 1000),
+                   'total;dur=%.1f' % (total * 1000)]
+        if self.debug:
+            for index, (operation, duration, error, site) in enumerate(
+                    timings.calls):
+                entries.append('trove-%d;dur=%.1f;desc="%s%s"'
+                               % (index, duration * 1000, operation,
+                                  ' (failed)' if error else ''))
+            LOG.info("%s %s: %d trove calls, %.3fs API, %d cache hits, "
+                     "%.3fs total: %s", request.method, request.path,
+                     len(timings.calls), timings.api_time,
+                     timings.cache_hits, total,
+                     ', '.join('%s %.3fs' % (call[0], call[1])
+                               for call in timings.calls))
+        response['Server-Timing'] = ', '.join(entries)
+        return response
@@ -0,0 +1,113 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compact rows of the index tables.
+
+A troveclient resource keeps its whole ``_info`` dict, and the views used
+to hang a full flavor on every instance and a full instance on every
+backup. The index tables only need a few columns, so they render these
+``__slots__`` objects instead, and the flavors and instances the rows
+point to are interned: every row referencing one shares a single copy.
+"""
+
+
+class Interned(object):
+    """One ``factory(obj)`` per object id, shared by every row."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._items = {}
+
+    def get(self, obj):
+        if obj is None:
+            return None
+        key = str(obj.id)
+        item = self._items.get(key)
+        if item is None:
+            item = self._items[key] = self.factory(obj)
+        return item
+
+
+class FlavorRef(object):
+    __slots__ = ('id', 'name', 'ram')
+
+    def __init__(self, flavor):
+        self.id = flavor.id
+        self.name = flavor.name
+        self.ram = flavor.ram
+
+
+class InstanceRef(object):
+    __slots__ = ('id', 'name')
+
+    def __init__(self, instance):
+        self.id = instance.id
+        self.name = instance.name
+
+
+class InstanceRow(object):
+    """The columns of ``InstancesTable``, ``full_flavor`` is a FlavorRef."""
+    __slots__ = ('id', 'name', 'status', 'ip', 'full_flavor')
+
+    def __init__(self, instance, flavor=None):
+        self.id = instance.id
+        self.name = instance.name
+        self.status = instance.status
+        self.ip = tuple(getattr(instance, 'ip', None) or ())
+        # Left unset when unknown, the size column checks with hasattr.
+        if flavor is not None:
+            self.full_flavor = flavor
+
+
+class BackupRow(object):
+    """The columns of ``BackupsTable``.
+
+    ``instance`` is an InstanceRef or the text shown when the instance is
+    gone.
+    """
+    __slots__ = ('id', 'name', 'status', 'created', 'locationRef',
+                 'instance_id', 'instance')
+
+    def __init__(self, backup, instance):
+        self.id = backup.id
+        self.name = backup.name
+        self.status = backup.status
+        self.created = getattr(backup, 'created', None)
+        self.locationRef = getattr(backup, 'locationRef', None)
+        self.instance_id = backup.instance_id
+        self.instance = instance
+
+
+def instance_rows(instances):
+    """InstanceRows of ``instances``, sharing one FlavorRef per flavor."""
+    flavors = Interned(FlavorRef)
+    return [InstanceRow(instance,
+                        flavors.get(getattr(instance, 'full_flavor', None)))
+            for instance in instances]
+
+
+def backup_rows(backups, instances, missing):
+    """BackupRows of ``backups``, sharing one InstanceRef per instance.
+
+    ``instances`` maps instance ids to instances, ``missing`` is shown for
+    backups whose instance is not in it.
+    """
+    refs = Interned(InstanceRef)
+    return [BackupRow(backup,
+                      refs.get(instances.get(backup.instance_id))
+                      or missing)
+            for backup in backups]
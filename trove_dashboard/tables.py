@@ -0,0 +1,66 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Table helpers shared by the database panels.
+"""
+import urllib
+
+from django.utils.translation import ugettext_lazy as _
+
+from trove_dashboard.api import search
+
+
+QUERY_PARAMS = search.Query.FILTERS + ('sort',)
+
+
+class QueryPaginationMixin(object):
+    """Keep the filters and sort order of an index in its "More" link."""
+
+    def get_pagination_string(self):
+        params = [(key, value.encode('utf-8'))
+                  for key, value in self.request.GET.items()
+                  if key in QUERY_PARAMS]
+        params.append((self._meta.pagination_param,
+                       self.get_object_id(self.data[-1])))
+        return urllib.urlencode(params)
+
+
+def filter_fields(request, fields):
+    """Describe the filter form of an index for ``_index_filters.html``.
+
+    ``fields`` are ``(name, label, choices)`` tuples, ``choices`` is None
+    for a text input or ``'date'`` for a date input.
+    """
+    described = []
+    for name, label, choices in fields:
+        field = {'name': name, 'label': label,
+                 'value': request.GET.get(name, '')}
+        if choices == 'date':
+            field['type'] = 'date'
+        elif choices is not None:
+            field['choices'] = [('', _('Any'))] + list(choices)
+        described.append(field)
+    return described
+
+
+def sort_choices(labels):
+    """``(value, label)`` pairs of the ``sort`` select, both directions."""
+    choices = [('', _('Default'))]
+    for key, label in labels:
+        choices.append((key, _('%s ascending') % label))
+        choices.append(('-' + key, _('%s descending') % label))
+    return choices
@@ -0,0 +1,177 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import threading
+import time
+import unittest
+
+import mock
+
+from trove_dashboard.api import cache
+
+
+class TTLCacheTests(unittest.TestCase):
+
+    def test_get_set(self):
+        c = cache.TTLCache()
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.get('a', 'default'), 'default')
+        c.set('a', 1)
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.stats()['hits'], 1)
+        self.assertEqual(c.stats()['misses'], 2)
+
+    def test_entries_expire(self):
+        c = cache.TTLCache(ttl=10)
+        with mock.patch.object(cache.time, 'time', return_value=100):
+            c.set('a', 1)
+            c.set('b', 2, ttl=30)
+        with mock.patch.object(cache.time, 'time', return_value=115):
+            self.assertIsNone(c.get('a'))
+            self.assertEqual(c.get('b'), 2)
+
+    def test_expires_caps_ttl(self):
+        c = cache.TTLCache(ttl=60)
+        with mock.patch.object(cache.time, 'time', return_value=100):
+            c.set('a', 1, expires=105)
+        with mock.patch.object(cache.time, 'time', return_value=110):
+            self.assertIsNone(c.get('a'))
+
+    def test_least_recently_used_is_evicted(self):
+        c = cache.TTLCache(maxsize=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.get('a')
+        c.set('c', 3)
+        self.assertEqual(c.get('a'), 1)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('c'), 3)
+        self.assertEqual(c.stats()['evictions'], 1)
+
+    def test_purge(self):
+        c = cache.TTLCache(ttl=10)
+        with mock.patch.object(cache.time, 'time', return_value=100):
+            c.set('a', 1)
+            c.set('b', 2, ttl=60)
+        with mock.patch.object(cache.time, 'time', return_value=120):
+            c.purge()
+        self.assertEqual(len(c), 1)
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class StaleCacheTests(unittest.TestCase):
+
+    def test_loads_once(self):
+        c = cache.StaleCache('test', soft_ttl=30, hard_ttl=300)
+        loader = mock.Mock(return_value='a')
+        self.assertEqual(c.get('k', loader)[0], 'a')
+        self.assertEqual(c.get('k', loader)[0], 'a')
+        self.assertEqual(loader.call_count, 1)
+
+    def test_stale_value_served_while_refreshing(self):
+        c = cache.StaleCache('test', soft_ttl=0, hard_ttl=300)
+        c.get('k', lambda: 'old')
+        self.assertEqual(c.get('k', lambda: 'new')[0], 'old')
+        self.assertTrue(wait_for(lambda: c.peek('k')[0] == 'new'))
+
+    def test_invalidate(self):
+        c = cache.StaleCache('test', soft_ttl=30, hard_ttl=300)
+        c.get('k', lambda: 'old')
+        c.invalidate('k')
+        self.assertIsNone(c.peek('k'))
+        self.assertEqual(c.get('k', lambda: 'new')[0], 'new')
+
+    def test_load_running_during_invalidate_is_not_kept(self):
+        c = cache.StaleCache('test', soft_ttl=30, hard_ttl=300)
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            loading.set()
+            release.wait(2)
+            return 'old'
+
+        thread = threading.Thread(target=c.get, args=('k', slow))
+        thread.start()
+        loading.wait(2)
+        c.invalidate('k')
+        release.set()
+        thread.join()
+        self.assertIsNone(c.peek('k'))
+
+    def test_expired_value_served_while_refreshing(self):
+        c = cache.StaleCache('test', soft_ttl=30, hard_ttl=300)
+        c.get('k', lambda: 'old')
+        c.expire('k')
+        self.assertEqual(c.get('k', lambda: 'new')[0], 'old')
+        self.assertTrue(wait_for(lambda: c.peek('k')[0] == 'new'))
+
+
+class FakeBackend(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def get_many(self, keys):
+        return dict((k, self.data[k]) for k in keys if k in self.data)
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+    def set_many(self, values, ttl=None):
+        self.data.update(values)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class SharedCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend()
+        patcher = mock.patch.object(cache, '_get_backend',
+                                    return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_large_values_are_chunked(self):
+        value = [str(i) * 10 for i in range(2000)]
+        c = cache.SharedCache('test', backend='shared', chunk_size=100)
+        c.set('k', value)
+        self.assertTrue(len(self.backend.data) > 2)
+        self.assertTrue(all(len(v) <= 100 for v in self.backend.data.values()
+                            if isinstance(v, str)))
+        other = cache.SharedCache('test', backend='shared', chunk_size=100)
+        self.assertEqual(other.get('k', fresh=True), value)
+
+    def test_missing_chunk_is_a_miss(self):
+        c = cache.SharedCache('test', backend='shared', chunk_size=100)
+        c.set('k', [str(i) * 10 for i in range(2000)])
+        chunk = [k for k, v in self.backend.data.items()
+                 if isinstance(v, str)][0]
+        del self.backend.data[chunk]
+        other = cache.SharedCache('test', backend='shared', chunk_size=100)
+        self.assertIsNone(other.get('k', fresh=True))
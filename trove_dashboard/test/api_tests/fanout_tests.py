@@ -0,0 +1,78 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import time
+import unittest
+
+from trove_dashboard.api import fanout
+
+
+def echo(request, value, delay=0):
+    time.sleep(delay)
+    return value
+
+
+def fail(request):
+    raise ValueError("boom")
+
+
+class FanoutTests(unittest.TestCase):
+
+    def test_results_in_order(self):
+        results = fanout.fanout(None, [(echo, (i, 0.01 * (5 - i)))
+                                       for i in range(5)])
+        self.assertEqual([r.get() for r in results], range(5))
+
+    def test_exceptions_are_returned(self):
+        ok, failed = fanout.fanout(None, [(echo, (1,)), (fail, ())])
+        self.assertTrue(ok.ok)
+        self.assertFalse(failed.ok)
+        self.assertIsInstance(failed.exception, ValueError)
+        self.assertRaises(ValueError, failed.get)
+
+    def test_calls_past_the_deadline_time_out(self):
+        start = time.time()
+        results = fanout.fanout(None, [(echo, (1,)), (echo, (2, 1))],
+                                timeout=0.2)
+        self.assertLess(time.time() - start, 0.9)
+        self.assertEqual(results[0].get(), 1)
+        self.assertIsInstance(results[1].exception, fanout.FanoutTimeout)
+
+    def test_slow_call_does_not_hold_up_its_lane(self):
+        calls = [(echo, (0, 1))] + [(echo, (i, 0.01)) for i in range(1, 21)]
+        results = fanout.fanout(None, calls, timeout=0.5, concurrency=2)
+        self.assertIsInstance(results[0].exception, fanout.FanoutTimeout)
+        self.assertTrue(all(r.ok for r in results[1:]))
+
+    def test_nested_batches_run_inline(self):
+        def nested(request):
+            return [r.get() for r in fanout.fanout(request,
+                                                   [(echo, (1,)),
+                                                    (echo, (2,))])]
+        results = fanout.fanout(None, [(nested, ()), (echo, (3,))])
+        self.assertEqual(results[0].get(), [1, 2])
+
+    def test_own_executor_is_apart_from_the_default(self):
+        writes = fanout.Executor(1)
+        writes.pool().apply_async(time.sleep, (0.5,))
+        results = fanout.fanout(None, [(echo, (i,)) for i in range(20)],
+                                timeout=0.2)
+        self.assertTrue(all(r.ok for r in results))
+        # A single call still runs on the executor, not inline.
+        results = fanout.fanout(None, [(echo, (1,))], timeout=0.1,
+                                executor=writes)
+        self.assertIsInstance(results[0].exception, fanout.FanoutTimeout)
@@ -0,0 +1,118 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import threading
+import time
+
+import mock
+
+from trove_dashboard.api import pool
+from trove_dashboard.api import trove
+from trove_dashboard.test import helpers
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class ClientPoolTests(helpers.FakeTroveTestCase):
+    instances = 5
+    backups = 0
+
+    def pool(self, **kwargs):
+        return pool.ClientPool(trove.registry, **kwargs)
+
+    def test_lease_reuses_the_client(self):
+        client_pool = self.pool()
+        request = self.request()
+        with client_pool.lease(request) as rdc:
+            self.assertEqual(len(rdc.instances.list()), 5)
+            connections = dict(rdc.client.connections)
+        with client_pool.lease(request) as again:
+            again.instances.list()
+        self.assertIs(again, rdc)
+        # The keep-alive connection is used again, not reopened.
+        self.assertEqual(again.client.connections, connections)
+        stats = client_pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_idle_clients_are_closed(self):
+        client_pool = self.pool(idle_timeout=0)
+        request = self.request()
+        with client_pool.lease(request) as rdc:
+            rdc.instances.list()
+        with client_pool.lease(request) as again:
+            again.instances.list()
+        self.assertIsNot(again, rdc)
+        self.assertEqual(client_pool.stats()['closed'], 1)
+
+    def test_saturated_endpoint_times_out(self):
+        client_pool = self.pool(per_host=1, wait_timeout=0.1)
+        request = self.request()
+        errors = []
+
+        def second():
+            try:
+                with client_pool.lease(request):
+                    pass
+            except pool.PoolTimeout as e:
+                errors.append(e)
+
+        with mock.patch.object(pool, '_close', wraps=pool._close) as close:
+            with client_pool.lease(request) as rdc:
+                rdc.instances.list()
+                thread = threading.Thread(target=second)
+                thread.start()
+                thread.join(5)
+            self.assertEqual(len(errors), 1)
+            # The client created for the timed out call is closed, the
+            # leased one goes back to the pool.
+            self.assertEqual(close.call_count, 1)
+            self.assertIsNot(close.call_args[0][0], rdc)
+        stats = client_pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['saturated'], 1)
+        self.assertEqual(stats['closed'], 1)
+        self.assertEqual(stats['active'], {pool._host(rdc): 0})
+        self.assertEqual(stats['idle'], 1)
+
+    def test_waiting_call_gets_the_released_slot(self):
+        client_pool = self.pool(per_host=1, wait_timeout=5)
+        request = self.request()
+        leased = threading.Event()
+        results = []
+
+        def second():
+            leased.wait(5)
+            with client_pool.lease(request) as rdc:
+                results.append(len(rdc.instances.list()))
+
+        thread = threading.Thread(target=second)
+        thread.start()
+        with client_pool.lease(request):
+            leased.set()
+            # Let the second call block on the saturated endpoint.
+            self.assertTrue(wait_for(
+                lambda: client_pool.stats()['saturated'] == 1))
+        thread.join(5)
+        self.assertEqual(results, [5])
+        self.assertEqual(client_pool.stats()['closed'], 0)
@@ -0,0 +1,46 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import time
+import unittest
+
+from trove_dashboard.api import ratelimit
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_burst_then_deadline(self):
+        limiter = ratelimit.RateLimiter(rate=1, burst=2)
+        deadline = time.time() + 0.1
+        self.assertTrue(limiter.acquire('a', deadline))
+        self.assertTrue(limiter.acquire('a', deadline))
+        self.assertFalse(limiter.acquire('a', deadline))
+        # Keys have their own bucket.
+        self.assertTrue(limiter.acquire('b', deadline))
+
+    def test_refused_slot_is_given_back(self):
+        limiter = ratelimit.RateLimiter(rate=20, burst=1)
+        self.assertTrue(limiter.acquire('a'))
+        self.assertFalse(limiter.acquire('a', time.time()))
+        start = time.time()
+        self.assertTrue(limiter.acquire('a', time.time() + 1))
+        self.assertLess(time.time() - start, 0.1)
+
+    def test_disabled(self):
+        limiter = ratelimit.RateLimiter(rate=0)
+        for i in range(100):
+            self.assertTrue(limiter.acquire('a', time.time()))
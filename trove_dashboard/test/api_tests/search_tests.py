@@ -0,0 +1,80 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import unittest
+
+from trove_dashboard.api import search
+
+
+def infos(*names):
+    return [{'id': str(i), 'name': name, 'status': 'ACTIVE',
+             'created': '2013-01-%02d' % (i + 1)}
+            for i, name in enumerate(names)]
+
+
+class QueryTests(unittest.TestCase):
+
+    def test_page_walks_markers(self):
+        objects = infos('a', 'b', 'c', 'd', 'e')
+        query = search.Query({})
+        page, marker = query.page(objects, limit=2)
+        self.assertEqual([o['id'] for o in page], ['0', '1'])
+        self.assertEqual(marker, '1')
+        page, marker = query.page(objects, marker=marker, limit=2)
+        self.assertEqual([o['id'] for o in page], ['2', '3'])
+        page, marker = query.page(objects, marker=marker, limit=2)
+        self.assertEqual([o['id'] for o in page], ['4'])
+        self.assertIsNone(marker)
+
+    def test_page_exactly_full(self):
+        page, marker = search.Query({}).page(infos('a', 'b'), limit=2)
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(marker)
+
+    def test_unknown_marker_starts_over(self):
+        page, marker = search.Query({}).page(infos('a', 'b'),
+                                             marker='gone', limit=1)
+        self.assertEqual([o['id'] for o in page], ['0'])
+        self.assertEqual(marker, '0')
+
+    def test_apply_filters_and_sorts(self):
+        objects = infos('db-b', 'web', 'db-a')
+        objects[0]['status'] = 'BUILD'
+        query = search.Query({'q': 'DB', 'sort': '-name'})
+        self.assertEqual([o['name'] for o in query.apply(objects)],
+                         ['db-b', 'db-a'])
+        query = search.Query({'status': 'active',
+                              'created_after': '2013-01-02'})
+        self.assertEqual([o['name'] for o in query.apply(objects)],
+                         ['web', 'db-a'])
+
+    def test_unknown_sort_is_ignored(self):
+        self.assertFalse(search.Query({'sort': 'password'}))
+
+
+class PrefixIndexTests(unittest.TestCase):
+
+    def test_search_words_and_pages(self):
+        index = search.PrefixIndex(infos('nightly-db', 'db-nightly',
+                                         'weekly'))
+        found, more = index.search('night', limit=1)
+        self.assertEqual(len(found), 1)
+        self.assertTrue(more)
+        found, more = index.search('night', offset=1, limit=1)
+        self.assertEqual(len(found), 1)
+        self.assertFalse(more)
+        self.assertEqual(index.get('2')['name'], 'weekly')
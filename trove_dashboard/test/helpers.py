@@ -0,0 +1,72 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Test cases running the panels' views against ``tools/fake_trove.py``.
+"""
+import os
+import sys
+
+from django import test
+from django.test.client import RequestFactory
+
+from trove_dashboard.api import trove
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), 'tools'))
+
+import benchmark  # noqa
+import fake_trove  # noqa
+
+
+class FakeTroveTestCase(test.TestCase):
+    """Starts a fake Trove service with ``instances`` and ``backups``."""
+    instances = 50
+    backups = 100
+
+    def setUp(self):
+        super(FakeTroveTestCase, self).setUp()
+        self.data = fake_trove.FakeData(instances=self.instances,
+                                        backups=self.backups)
+        self.server = fake_trove.FakeTrove(self.data)
+        self.server.start()
+        self.factory = RequestFactory()
+        # Every test talks to its own server, nothing cached may leak.
+        trove.registry.clear()
+        trove.client_pool.clear()
+        trove.flavor_cache.clear()
+        trove.list_cache.clear()
+        trove.search_indexes.clear()
+        trove.instance_infos.clear()
+        trove.not_found.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(FakeTroveTestCase, self).tearDown()
+
+    def request(self, params=None, ajax=False):
+        return benchmark._request(self.factory, self.server, params or {},
+                                  ajax)
+
+    def render(self, view_class, params=None, **kwargs):
+        """Return the request and the rendered response of a view."""
+        request = self.request(params)
+        response = view_class.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return request, response
@@ -0,0 +1,29 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Settings of the trove_dashboard tests, on top of those of horizon::
+
+    django-admin.py test trove_dashboard \\
+        --settings=trove_dashboard.test.settings
+"""
+from openstack_dashboard.test.settings import *  # noqa
+
+INSTALLED_APPS = tuple(INSTALLED_APPS) + ('trove_dashboard',)
+
+# Views going over their budget of Trove API calls fail the tests.
+TROVE_API_BUDGET_STRICT = True
@@ -0,0 +1,216 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Views shared by the database panels.
+"""
+import csv
+import logging
+import StringIO
+import time
+
+import simplejson as json
+
+from django import http
+from django.conf import settings
+from django.utils.encoding import force_unicode
+from django.views import generic
+
+from trove_dashboard import api
+from trove_dashboard.api import metrics
+from trove_dashboard import jobs
+
+
+LOG = logging.getLogger(__name__)
+
+# Django 1.5+, older versions stream an iterator given to HttpResponse.
+StreamingHttpResponse = getattr(http, 'StreamingHttpResponse',
+                                http.HttpResponse)
+
+
+def data_age(fetched_at):
+    """Seconds since a cached list was fetched, None for live data."""
+    if fetched_at is None:
+        return None
+    return int(time.time() - fetched_at)
+
+
+class BatchRowUpdateView(generic.View):
+    """Render the rows of ``table_class`` for many object ids at once.
+
+    The index pages poll this view with every pending row id instead of
+    sending one ajax request per row. The response maps each id to the
+    status and html of its row and lists the ids that no longer exist::
+
+        {"rows": {"<id>": {"status": null, "html": "<tr ...>"}},
+         "deleted": ["<id>"]}
+
+    Subclasses implement ``get_rows_data`` which returns the loaded data
+    and the ids the API reported as gone.
+    """
+    table_class = None
+    id_param = 'id'
+    max_ids = 200
+
+    def get_rows_data(self, ids):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        ids = request.GET.getlist(self.id_param)[:self.max_ids]
+        table = self.table_class(request)
+        data, deleted = self.get_rows_data(ids)
+        rows = {}
+        for datum in data:
+            row = table._meta.row_class(table, datum)
+            rows[table.get_object_id(datum)] = {'status': row.status,
+                                                'html': row.render()}
+        return http.HttpResponse(json.dumps({'rows': rows,
+                                             'deleted': deleted}),
+                                 content_type='application/json')
+
+
+class MetricsView(generic.View):
+    """Expose the ``PrometheusSink`` metrics in the text format.
+
+    Not routed by the panels; mount it in the site urls to let Prometheus
+    scrape it without a dashboard session.
+    """
+
+    def get(self, request, *args, **kwargs):
+        metrics.get_sinks()
+        text = ''.join(sink.render() for sink in
+                       metrics.PrometheusSink.instances)
+        return http.HttpResponse(
+            text, content_type='text/plain; version=0.0.4')
+
+
+class JobProgressView(generic.View):
+    """Progress of a ``jobs.BulkJob`` of the project as JSON."""
+
+    def get(self, request, job_id, *args, **kwargs):
+        progress = jobs.get_progress(request, job_id)
+        if progress is None:
+            raise http.Http404
+        return http.HttpResponse(json.dumps(progress),
+                                 content_type='application/json')
+
+
+class SearchView(generic.View):
+    """Search the instances or backups of the project for a picker.
+
+    ``?q=<prefix>&offset=<n>`` returns one page of the objects whose name,
+    a word of it or id starts with the query, from the cached index of
+    ``api.trove.search_index``::
+
+        {"results": [{"id": "<id>", "text": "<label>"}], "more": true}
+    """
+    kind = None
+    page_size = getattr(settings, 'TROVE_SEARCH_PAGE_SIZE', 20)
+
+    def get_label(self, info):
+        return info.get('name') or info['id']
+
+    def get(self, request, *args, **kwargs):
+        try:
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            offset = 0
+        index = api.trove.search_index(request, self.kind)
+        objects, more = index.search(request.GET.get('q', ''),
+                                     offset=offset, limit=self.page_size)
+        results = [{'id': info['id'], 'text': self.get_label(info)}
+                   for info in objects]
+        return http.HttpResponse(json.dumps({'results': results,
+                                             'more': more}),
+                                 content_type='application/json')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    # Headers are lazy translations, ``str`` would give their repr.
+    return force_unicode(value).encode('utf-8')
+
+
+class ExportView(generic.View):
+    """Stream the rows of ``get_rows`` as CSV or JSON.
+
+    ``get_rows`` yields one dict per row and should page through the API
+    lazily, so memory stays flat and the first rows are sent before the
+    last page is fetched. ``columns`` are ``(key, header)`` pairs, the
+    url passes ``format`` (``csv`` or ``json``).
+    """
+    columns = ()
+    filename = 'export'
+    # Rows written per chunk of the response.
+    chunk_rows = 100
+
+    def get_filename(self, request, *args, **kwargs):
+        return self.filename
+
+    def get_rows(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def _rows(self, request, *args, **kwargs):
+        try:
+            for row in self.get_rows(request, *args, **kwargs):
+                yield row
+        except Exception:
+            # The status is sent already. Re-raise so the server drops the
+            # connection, instead of ending the document as if it were
+            # complete.
+            LOG.exception("Export %s failed, aborting the response",
+                          request.path)
+            raise
+
+    def _csv(self, rows):
+        buf = StringIO.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow([_csv_value(header) for key, header in self.columns])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        for count, row in enumerate(rows, 1):
+            writer.writerow([_csv_value(row.get(key))
+                             for key, header in self.columns])
+            if count % self.chunk_rows == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    def _json(self, rows):
+        keys = [key for key, header in self.columns]
+        yield '['
+        separator = '\n'
+        for row in rows:
+            yield separator + json.dumps(dict((key, row.get(key))
+                                              for key in keys))
+            separator = ',\n'
+        yield '\n]\n'
+
+    def get(self, request, *args, **kwargs):
+        format = kwargs.pop('format', 'csv')
+        filename = self.get_filename(request, *args, **kwargs)
+        rows = self._rows(request, *args, **kwargs)
+        if format == 'json':
+            content, content_type = self._json(rows), 'application/json'
+        else:
+            content, content_type = self._csv(rows), 'text/csv'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = ('attachment; filename="%s.%s"'
+                                           % (filename, format))
+        return response
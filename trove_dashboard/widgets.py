@@ -0,0 +1,48 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Rackspace Hosting
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Form widgets shared by the database panels.
+"""
+from django import forms
+from django.core.urlresolvers import reverse
+from django.template.loader import render_to_string
+
+
+class SearchSelect(forms.TextInput):
+    """Pick one object by searching a ``views.SearchView`` as you type.
+
+    Only the id of the picked object is submitted, the form renders no
+    choices, so its size does not grow with the number of objects.
+    ``search_url`` is the name of the url of the view, ``label`` the text
+    shown for an initial value.
+    """
+
+    def __init__(self, search_url, attrs=None):
+        super(SearchSelect, self).__init__(attrs)
+        self.search_url = search_url
+        self.label = None
+
+    def render(self, name, value, attrs=None):
+        attrs = self.build_attrs(attrs, name=name)
+        field_id = attrs.get('id', 'id_%s' % name)
+        hidden = forms.HiddenInput().render(name, value,
+                                            attrs={'id': field_id})
+        return render_to_string('project/databases/_search_select.html',
+                                {'hidden': hidden,
+                                 'field_id': field_id,
+                                 'label': self.label or value or '',
+                                 'search_url': reverse(self.search_url)})